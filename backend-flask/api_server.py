@@ -33,7 +33,7 @@ try:
         get_wallet_service, get_usage_service, get_settings_service,
         get_plan_service, get_payment_service, get_analytics_service,
         get_user_management_service, get_db_context, init_billing,
-        USE_MONGODB
+        USE_MONGODB, MigrationRequired
     )
     from billing.token_service import tokens_to_credits, estimate_credits_needed
     
@@ -48,9 +48,9 @@ try:
     
     # MongoDB-specific imports
     if USE_MONGODB:
-        from billing.mongodb import get_mongo_db, get_db_session
+        from billing.mongodb import get_mongo_db, get_db_session, get_reader_session, USAGE_LOG_RETENTION_DAYS
     else:
-        from billing.database import get_db_session
+        from billing.database import get_db_session, get_reader_session
         from sqlalchemy import text
     
     BILLING_ENABLED = True
@@ -100,6 +100,9 @@ if BILLING_ENABLED:
         else:
             logger.warning("Billing not initialized - continuing without billing")
             BILLING_ENABLED = False
+    except MigrationRequired:
+        # Serving with billing disabled would give usage away for free
+        raise
     except Exception as e:
         logger.warning(f"Billing initialization failed: {e}")
         BILLING_ENABLED = False
@@ -2373,10 +2376,12 @@ def admin_update_setting(key):
         admin_email = getattr(request, 'user_email', 'admin')
         
         with get_db_session() as db:
-            success = SettingsService.update_setting(db, key, value, admin_email)
+            updated = SettingsService.update_setting(db, key, value, admin_email)
             
-            if success:
-                return jsonify({"success": True, "key": key, "value": value})
+            if updated:
+                # MongoDB returns the stored document - no need to re-read it
+                stored_value = updated.get('value', value) if isinstance(updated, dict) else value
+                return jsonify({"success": True, "key": key, "value": stored_value})
             else:
                 return jsonify({"success": False, "error": "Failed to update setting"}), 500
     except Exception as e:
@@ -2514,15 +2519,13 @@ def admin_get_analytics():
     
     try:
         days = request.args.get('days', 30, type=int)
+        if USE_MONGODB:
+            # Raw usage logs expire after the retention window
+            days = min(days, USAGE_LOG_RETENTION_DAYS)
         
-        with get_db_session() as db:
-            analytics = {
-                'usage_stats': AnalyticsService.get_usage_stats(db, days),
-                'daily_usage': AnalyticsService.get_daily_usage(db, days),
-                'top_users': AnalyticsService.get_top_users(db, 10, days),
-                'top_agents': AnalyticsService.get_top_agents(db, 10, days),
-                'user_summary': AnalyticsService.get_user_summary(db)
-            }
+        with get_reader_session() as db:
+            analytics = AnalyticsService.get_admin_overview(db, days, 10)
+            analytics['user_summary'] = AnalyticsService.get_user_summary(db)
             return jsonify({"success": True, "analytics": analytics})
     except Exception as e:
         logger.error(f"Admin analytics error: {e}")
@@ -2769,11 +2772,11 @@ def get_billing_usage():
     chatbot_id = request.args.get('chatbot_id')
     
     try:
-        with get_db_session() as db:
-            usage = UsageService.get_usage_history(
+        with get_reader_session() as db:
+            bundle = UsageService.get_dashboard_bundle(
                 db, request.user_id, limit=limit, chatbot_id=chatbot_id
             )
-            summary = UsageService.get_usage_summary(db, request.user_id)
+            usage, summary = bundle["usage"], bundle["summary"]
             
             return jsonify({
                 "success": True,
@@ -2785,6 +2788,48 @@ def get_billing_usage():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route('/billing/usage/export', methods=['GET'])
+@verify_jwt
+def export_billing_usage():
+    """Export user's full usage history as JSON lines"""
+    if not BILLING_ENABLED:
+        return jsonify({"success": False, "error": "Billing not available"}), 503
+    
+    user_id = request.user_id
+    chatbot_id = request.args.get('chatbot_id')
+    
+    def generate():
+        with get_reader_session() as db:
+            for record in UsageService.stream_usage_history(db, user_id, chatbot_id=chatbot_id):
+                yield json.dumps(record) + "\n"
+    
+    records = generate()
+    try:
+        # Open the session and read the first record before committing to a 200,
+        # so an unreachable database is reported as an error, not an empty export
+        first = next(records, None)
+    except Exception as e:
+        logger.error(f"Error exporting usage: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    
+    def stream():
+        if first is None:
+            return
+        yield first
+        try:
+            yield from records
+        except Exception as e:
+            logger.error(f"Error exporting usage: {e}")
+            # Headers are already sent; a trailing record marks the export as truncated
+            yield json.dumps({"error": "Export interrupted", "complete": False}) + "\n"
+    
+    return Response(
+        stream(),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=usage.jsonl'}
+    )
+
+
 @app.route('/billing/payments', methods=['GET'])
 @verify_jwt
 def get_billing_payments():
@@ -2877,7 +2922,7 @@ def billing_admin_get_usage():
         total_users = users_collection.count_documents({})
         total_bots = len(rag_system.agents)
         
-        with get_db_session() as db:
+        with get_reader_session() as db:
             # Get totals from usage logs
             result = db.execute(text("""
                 SELECT 
@@ -3084,7 +3129,7 @@ def billing_admin_delete_plan(plan_id):
 def billing_admin_get_analytics():
     """Get analytics data (Admin only)"""
     try:
-        with get_db_session() as db:
+        with get_reader_session() as db:
             analytics = AnalyticsService.get_dashboard_analytics(db)
             return jsonify(analytics)
     except Exception as e:
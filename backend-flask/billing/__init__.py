@@ -1,8 +1,8 @@
 # Billing module for credit-based billing system
-from billing.models import Base, User, Wallet, UsageLog, Payment
+from billing.models import Base, User, Wallet, UsageLog, DailyUsageTotal, Payment
 from billing.database import init_db, get_db, SessionLocal
 
 __all__ = [
-    'Base', 'User', 'Wallet', 'UsageLog', 'Payment',
+    'Base', 'User', 'Wallet', 'UsageLog', 'DailyUsageTotal', 'Payment',
     'init_db', 'get_db', 'SessionLocal'
 ]
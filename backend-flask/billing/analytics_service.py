@@ -244,6 +244,16 @@ class AnalyticsService:
                 for r in results
             ]
 
+    @staticmethod
+    def get_admin_overview(db: Session, days: int = 30, limit: int = 10) -> dict:
+        """Usage summary, daily breakdown, top users and top agents for the admin dashboard"""
+        return {
+            "usage_stats": AnalyticsService.get_usage_stats(db, days),
+            "daily_usage": AnalyticsService.get_daily_usage(db, days),
+            "top_users": AnalyticsService.get_top_users(db, limit, days),
+            "top_agents": AnalyticsService.get_top_agents(db, limit, days),
+        }
+
     @staticmethod
     def get_revenue_stats(db: Session, days: int = 30) -> dict:
         """Get revenue statistics"""
@@ -8,9 +8,9 @@ from typing import Dict, List, Optional
 from decimal import Decimal
 
 from pymongo.database import Database
-from bson import ObjectId, Decimal128
+from bson import ObjectId
 
-from billing.mongodb import get_mongo_db, decimal128_to_float
+from billing.mongodb import get_mongo_db, micro_to_float, decimal128_to_float
 
 logger = logging.getLogger(__name__)
 
@@ -19,21 +19,9 @@ class AnalyticsServiceMongo:
     """MongoDB-based analytics service"""
     
     @staticmethod
-    def get_usage_summary(db: Database, days: int = 30) -> Dict:
-        """
-        Get overall usage summary for the past N days
-        
-        Args:
-            db: MongoDB database
-            days: Number of days to analyze
-            
-        Returns:
-            Summary dict with totals
-        """
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        
-        pipeline = [
-            {'$match': {'createdAt': {'$gte': cutoff}}},
+    def _usage_summary_stages() -> List[Dict]:
+        """Stages totalling queries, tokens, credits and distinct users/agents"""
+        return [
             {
                 '$group': {
                     '_id': None,
@@ -41,15 +29,16 @@ class AnalyticsServiceMongo:
                     'totalTokens': {'$sum': '$totalTokens'},
                     'totalInputTokens': {'$sum': '$inputTokens'},
                     'totalOutputTokens': {'$sum': '$outputTokens'},
-                    'totalCreditsUsed': {'$sum': '$creditsUsed'},
+                    'totalCreditsUsed': {'$sum': '$creditsUsedMicro'},
                     'uniqueUsers': {'$addToSet': '$userId'},
                     'uniqueAgents': {'$addToSet': '$agentName'}
                 }
             }
         ]
-        
-        result = list(db.usage_logs.aggregate(pipeline))
-        
+    
+    @staticmethod
+    def _format_usage_summary(result: List[Dict], days: int) -> Dict:
+        """Shape the usage summary group (or its absence) for the API"""
         if not result:
             return {
                 'total_queries': 0,
@@ -63,11 +52,7 @@ class AnalyticsServiceMongo:
             }
         
         data = result[0]
-        credits_used = data.get('totalCreditsUsed')
-        if isinstance(credits_used, Decimal128):
-            credits_used = float(credits_used.to_decimal())
-        else:
-            credits_used = float(credits_used or 0)
+        credits_used = micro_to_float(data.get('totalCreditsUsed'))
         
         return {
             'total_queries': data.get('totalQueries', 0),
@@ -81,21 +66,9 @@ class AnalyticsServiceMongo:
         }
     
     @staticmethod
-    def get_daily_usage(db: Database, days: int = 30) -> List[Dict]:
-        """
-        Get daily usage breakdown
-        
-        Args:
-            db: MongoDB database
-            days: Number of days
-            
-        Returns:
-            List of daily usage dicts
-        """
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        
-        pipeline = [
-            {'$match': {'createdAt': {'$gte': cutoff}}},
+    def _daily_usage_stages() -> List[Dict]:
+        """Stages grouping usage per calendar day, oldest first"""
+        return [
             {
                 '$group': {
                     '_id': {
@@ -105,47 +78,35 @@ class AnalyticsServiceMongo:
                     },
                     'queries': {'$sum': 1},
                     'tokens': {'$sum': '$totalTokens'},
-                    'credits': {'$sum': '$creditsUsed'}
+                    'credits': {'$sum': '$creditsUsedMicro'}
                 }
             },
             {'$sort': {'_id.year': 1, '_id.month': 1, '_id.day': 1}}
         ]
-        
-        results = list(db.usage_logs.aggregate(pipeline))
-        
+    
+    @staticmethod
+    def _format_daily_usage(results: List[Dict]) -> List[Dict]:
+        """Shape per-day groups as dated API rows"""
         return [
             {
                 'date': f"{r['_id']['year']}-{r['_id']['month']:02d}-{r['_id']['day']:02d}",
                 'queries': r['queries'],
                 'tokens': r['tokens'],
-                'credits': decimal128_to_float(r['credits'])
+                'credits': micro_to_float(r['credits'])
             }
             for r in results
         ]
     
     @staticmethod
-    def get_top_users(db: Database, limit: int = 10, days: int = 30) -> List[Dict]:
-        """
-        Get top users by token usage
-        
-        Args:
-            db: MongoDB database
-            limit: Number of users to return
-            days: Time period
-            
-        Returns:
-            List of user usage dicts
-        """
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        
-        pipeline = [
-            {'$match': {'createdAt': {'$gte': cutoff}}},
+    def _top_users_stages(limit: int) -> List[Dict]:
+        """Stages ranking users by tokens, joined to billing_users for the email"""
+        return [
             {
                 '$group': {
                     '_id': '$userId',
                     'queryCount': {'$sum': 1},
                     'totalTokens': {'$sum': '$totalTokens'},
-                    'totalCredits': {'$sum': '$creditsUsed'}
+                    'totalCredits': {'$sum': '$creditsUsedMicro'}
                 }
             },
             {'$sort': {'totalTokens': -1}},
@@ -160,37 +121,25 @@ class AnalyticsServiceMongo:
             },
             {'$unwind': {'path': '$user', 'preserveNullAndEmptyArrays': True}}
         ]
-        
-        results = list(db.usage_logs.aggregate(pipeline))
-        
+    
+    @staticmethod
+    def _format_top_users(results: List[Dict]) -> List[Dict]:
+        """Shape top-user groups for the API"""
         return [
             {
                 'user_id': str(r['_id']),
                 'email': r.get('user', {}).get('email', 'Unknown'),
                 'query_count': r['queryCount'],
                 'total_tokens': r['totalTokens'],
-                'total_credits': decimal128_to_float(r['totalCredits'])
+                'total_credits': micro_to_float(r['totalCredits'])
             }
             for r in results
         ]
     
     @staticmethod
-    def get_top_agents(db: Database, limit: int = 10, days: int = 30) -> List[Dict]:
-        """
-        Get most used agents
-        
-        Args:
-            db: MongoDB database
-            limit: Number of agents to return
-            days: Time period
-            
-        Returns:
-            List of agent usage dicts
-        """
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        
-        pipeline = [
-            {'$match': {'createdAt': {'$gte': cutoff}}},
+    def _top_agents_stages(limit: int) -> List[Dict]:
+        """Stages ranking agents by query count"""
+        return [
             {
                 '$group': {
                     '_id': '$agentName',
@@ -202,9 +151,10 @@ class AnalyticsServiceMongo:
             {'$sort': {'queryCount': -1}},
             {'$limit': limit}
         ]
-        
-        results = list(db.usage_logs.aggregate(pipeline))
-        
+    
+    @staticmethod
+    def _format_top_agents(results: List[Dict]) -> List[Dict]:
+        """Shape top-agent groups for the API"""
         return [
             {
                 'agent_name': r['_id'],
@@ -215,6 +165,113 @@ class AnalyticsServiceMongo:
             for r in results
         ]
     
+    @staticmethod
+    def _window_match(days: int) -> Dict:
+        """$match on createdAt for the last `days` days, run before the stages above"""
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        return {'$match': {'createdAt': {'$gte': cutoff}}}
+    
+    @staticmethod
+    def get_usage_summary(db: Database, days: int = 30) -> Dict:
+        """
+        Get overall usage summary for the past N days
+        
+        Args:
+            db: MongoDB database
+            days: Number of days to analyze
+            
+        Returns:
+            Summary dict with totals
+        """
+        pipeline = [AnalyticsServiceMongo._window_match(days)] + AnalyticsServiceMongo._usage_summary_stages()
+        result = list(db.usage_logs.aggregate(pipeline))
+        return AnalyticsServiceMongo._format_usage_summary(result, days)
+    
+    @staticmethod
+    def get_daily_usage(db: Database, days: int = 30) -> List[Dict]:
+        """
+        Get daily usage breakdown
+        
+        Args:
+            db: MongoDB database
+            days: Number of days
+            
+        Returns:
+            List of daily usage dicts
+        """
+        pipeline = [AnalyticsServiceMongo._window_match(days)] + AnalyticsServiceMongo._daily_usage_stages()
+        results = list(db.usage_logs.aggregate(pipeline))
+        return AnalyticsServiceMongo._format_daily_usage(results)
+    
+    @staticmethod
+    def get_top_users(db: Database, limit: int = 10, days: int = 30) -> List[Dict]:
+        """
+        Get top users by token usage
+        
+        Args:
+            db: MongoDB database
+            limit: Number of users to return
+            days: Time period
+            
+        Returns:
+            List of user usage dicts
+        """
+        pipeline = [AnalyticsServiceMongo._window_match(days)] + AnalyticsServiceMongo._top_users_stages(limit)
+        results = list(db.usage_logs.aggregate(pipeline))
+        return AnalyticsServiceMongo._format_top_users(results)
+    
+    @staticmethod
+    def get_top_agents(db: Database, limit: int = 10, days: int = 30) -> List[Dict]:
+        """
+        Get most used agents
+        
+        Args:
+            db: MongoDB database
+            limit: Number of agents to return
+            days: Time period
+            
+        Returns:
+            List of agent usage dicts
+        """
+        pipeline = [AnalyticsServiceMongo._window_match(days)] + AnalyticsServiceMongo._top_agents_stages(limit)
+        results = list(db.usage_logs.aggregate(pipeline))
+        return AnalyticsServiceMongo._format_top_agents(results)
+    
+    @staticmethod
+    def get_admin_overview(db: Database, days: int = 30, limit: int = 10) -> Dict:
+        """
+        Usage summary, daily breakdown, top users and top agents in one
+        aggregation: the usage_logs window is matched once and fanned out
+        with $facet.
+        
+        Args:
+            db: MongoDB database
+            days: Time period
+            limit: Number of top users/agents to return
+            
+        Returns:
+            Dict with usage_stats, daily_usage, top_users, top_agents
+        """
+        pipeline = [
+            AnalyticsServiceMongo._window_match(days),
+            {
+                '$facet': {
+                    'usageStats': AnalyticsServiceMongo._usage_summary_stages(),
+                    'dailyUsage': AnalyticsServiceMongo._daily_usage_stages(),
+                    'topUsers': AnalyticsServiceMongo._top_users_stages(limit),
+                    'topAgents': AnalyticsServiceMongo._top_agents_stages(limit)
+                }
+            }
+        ]
+        facets = next(db.usage_logs.aggregate(pipeline), {})
+        
+        return {
+            'usage_stats': AnalyticsServiceMongo._format_usage_summary(facets.get('usageStats', []), days),
+            'daily_usage': AnalyticsServiceMongo._format_daily_usage(facets.get('dailyUsage', [])),
+            'top_users': AnalyticsServiceMongo._format_top_users(facets.get('topUsers', [])),
+            'top_agents': AnalyticsServiceMongo._format_top_agents(facets.get('topAgents', []))
+        }
+    
     @staticmethod
     def get_revenue_summary(db: Database, days: int = 30) -> Dict:
         """
@@ -259,11 +316,7 @@ class AnalyticsServiceMongo:
             }
         
         data = result[0]
-        credits = data.get('totalCreditsAdded')
-        if isinstance(credits, Decimal128):
-            credits = float(credits.to_decimal())
-        else:
-            credits = float(credits or 0)
+        credits = decimal128_to_float(data.get('totalCreditsAdded'))
         
         return {
             'total_payments': data.get('totalPayments', 0),
@@ -281,7 +334,7 @@ class AnalyticsServiceMongo:
         
         # Get users with positive balance
         pipeline = [
-            {'$match': {'wallet.creditsRemaining': {'$gt': Decimal128('0')}}},
+            {'$match': {'wallet.creditsRemaining': {'$gt': 0}}},
             {'$count': 'count'}
         ]
         result = list(db.billing_users.aggregate(pipeline))
@@ -13,14 +13,26 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.pool import QueuePool
 
+from billing.service_factory import MigrationRequired
+
 logger = logging.getLogger(__name__)
 
 # Get database URL from environment
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
+# Connection pool configuration (tunable via environment)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '15'))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
+
+# Optional read replica for reporting/analytics reads (falls back to DATABASE_URL)
+DATABASE_READER_URL = os.environ.get('DATABASE_READER_URL')
+
 # Global engine and session factory
 _engine = None
 _SessionLocal = None
+_reader_engine = None
+_ReaderSessionLocal = None
 
 
 def _ensure_database_exists(database_url: str) -> bool:
@@ -131,10 +143,10 @@ def get_engine():
         _engine = create_engine(
             DATABASE_URL,
             poolclass=QueuePool,
-            pool_size=10,
-            max_overflow=20,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
             pool_pre_ping=True,
-            pool_recycle=3600,
+            pool_recycle=DB_POOL_RECYCLE,
             echo=False
         )
         
@@ -176,6 +188,33 @@ def get_engine():
         raise
 
 
+def get_reader_engine():
+    """
+    Get or create the read-only engine for reporting queries.
+    Uses DATABASE_READER_URL (a replica) when set, otherwise the primary engine.
+    """
+    global _reader_engine
+    
+    if _reader_engine is not None:
+        return _reader_engine
+    
+    if not DATABASE_READER_URL:
+        return get_engine()
+    
+    _reader_engine = create_engine(
+        DATABASE_READER_URL,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=DB_POOL_RECYCLE,
+        echo=False
+    ).execution_options(postgresql_readonly=True)
+    
+    logger.info(f"✓ Read replica engine created ({urlparse(DATABASE_READER_URL).hostname})")
+    return _reader_engine
+
+
 def get_session_factory():
     """Get or create scoped session factory"""
     global _SessionLocal
@@ -223,16 +262,62 @@ def init_db():
         
         logger.info("Billing database tables initialized successfully")
         
+        # Refuse to run against tables that still need migrate_billing_schema.py
+        _check_schema(engine)
+        
         # Seed default data only if tables are empty
         _seed_default_data(engine)
         
         return True
         
+    except MigrationRequired:
+        raise
     except Exception as e:
         logger.error(f"Failed to initialize billing database: {e}")
         return False
 
 
+# Columns added after the tables were first created: create_all() doesn't
+# alter existing tables, so migrate_billing_schema.py adds and backfills them
+REQUIRED_COLUMNS = {
+    'usage_logs': ('created_date', 'credits_used_int'),
+    'daily_usage_totals': ('credits_int',),
+}
+
+
+def _check_schema(engine):
+    """
+    Raise MigrationRequired if columns the billing code queries are missing
+    or the daily rollup was never backfilled. Only cheap catalog/EXISTS
+    queries run here; nothing is altered at startup.
+    """
+    with engine.connect() as conn:
+        existing = set(conn.execute(text("""
+            SELECT table_name, column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = ANY(:tables)
+        """), {"tables": list(REQUIRED_COLUMNS)}).fetchall())
+    
+    missing = [
+        f"{table}.{column}"
+        for table, columns in REQUIRED_COLUMNS.items()
+        for column in columns
+        if (table, column) not in existing
+    ]
+    if missing:
+        logger.error(f"Billing schema is missing {', '.join(missing)} - run migrate_billing_schema.py")
+        raise MigrationRequired(f"Billing schema is missing {', '.join(missing)}; run migrate_billing_schema.py")
+    
+    # Usage logs without any rollup rows means the rollup was never backfilled
+    with engine.connect() as conn:
+        unrolled = conn.execute(text("""
+            SELECT EXISTS (SELECT 1 FROM usage_logs)
+               AND NOT EXISTS (SELECT 1 FROM daily_usage_totals)
+        """)).scalar()
+    if unrolled:
+        logger.error("daily_usage_totals has not been backfilled - run migrate_billing_schema.py")
+        raise MigrationRequired("daily_usage_totals has not been backfilled; run migrate_billing_schema.py")
+
+
 def _seed_default_data(engine):
     """
     Seed default settings and plans only if they don't exist.
@@ -368,6 +453,29 @@ def get_db_session():
         SessionFactory.remove()
 
 
+@contextmanager
+def get_reader_session():
+    """
+    Context manager for read-only reporting sessions (analytics, usage history).
+    Never commits; keeps reporting load off the write-path connection pool
+    when DATABASE_READER_URL is configured.
+    """
+    global _ReaderSessionLocal
+    
+    if _ReaderSessionLocal is None:
+        engine = get_reader_engine()
+        if engine is None:
+            raise RuntimeError("Billing database not available")
+        _ReaderSessionLocal = sessionmaker(bind=engine, autoflush=False)
+    
+    session = _ReaderSessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
 def check_db_health():
     """Check if database connection is healthy"""
     engine = get_engine()
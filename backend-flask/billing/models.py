@@ -3,7 +3,7 @@ SQLAlchemy Models for Billing System
 Tables auto-created on startup via Base.metadata.create_all()
 PostgreSQL only - no SQLite support
 """
-from sqlalchemy import Column, String, Integer, Numeric, DateTime, ForeignKey, Index, Text, Boolean
+from sqlalchemy import Column, String, Integer, BigInteger, Numeric, DateTime, Date, ForeignKey, Index, Text, Boolean
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 import uuid
@@ -65,9 +65,11 @@ class UsageLog(Base):
     output_tokens = Column(Integer, nullable=False, default=0)
     total_tokens = Column(Integer, nullable=False, default=0)
     credits_used = Column(Numeric(10, 4), nullable=False, default=0)
+    credits_used_int = Column(BigInteger, default=0)  # credits_used x 10000, for integer aggregation
     session_id = Column(String(100))
     query_text = Column(Text)  # Optional: store truncated query for debugging
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_date = Column(Date, default=lambda: datetime.utcnow().date())  # UTC day bucket for daily rollups
     
     # Relationship
     user = relationship("User", back_populates="usage_logs")
@@ -75,6 +77,7 @@ class UsageLog(Base):
     # Indexes
     __table_args__ = (
         Index('idx_usage_user_date', 'user_id', 'created_at'),
+        Index('idx_usage_user_day', 'user_id', 'created_date'),
         Index('idx_usage_chatbot', 'chatbot_id', 'created_at'),
     )
     
@@ -82,6 +85,21 @@ class UsageLog(Base):
         return f"<UsageLog tokens={self.total_tokens} credits={self.credits_used}>"
 
 
+class DailyUsageTotal(Base):
+    """Per-user daily usage rollup, maintained when usage logs are written"""
+    __tablename__ = 'daily_usage_totals'
+    
+    user_id = Column(String(36), ForeignKey('billing_users.id', ondelete='CASCADE'), primary_key=True)
+    date = Column(Date, primary_key=True)  # UTC day
+    queries = Column(Integer, nullable=False, default=0)
+    tokens = Column(BigInteger, nullable=False, default=0)
+    credits = Column(Numeric(14, 4), nullable=False, default=0)
+    credits_int = Column(BigInteger, default=0)  # credits x 10000
+    
+    def __repr__(self):
+        return f"<DailyUsageTotal user={self.user_id} date={self.date} queries={self.queries}>"
+
+
 class Payment(Base):
     """Payment records for Razorpay transactions"""
     __tablename__ = 'payments'
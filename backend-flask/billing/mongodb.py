@@ -8,27 +8,63 @@ for the billing system using native PyMongo.
 
 import os
 import logging
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Union
 from contextlib import contextmanager
 
 from pymongo import MongoClient, ASCENDING, DESCENDING
 from pymongo.database import Database
 from pymongo.collection import Collection
 from bson import ObjectId, Decimal128
+from bson.codec_options import CodecOptions, TypeCodec, TypeRegistry
 from decimal import Decimal
 from dotenv import load_dotenv
 
+from billing.service_factory import MigrationRequired
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Connection pool configuration (tunable via environment)
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '50'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '5'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000'))
+
+# Separate pool for reporting reads, routed to secondaries when available
+MONGO_RO_MAX_POOL_SIZE = int(os.getenv('MONGO_RO_MAX_POOL_SIZE', '20'))
+
 # Global MongoDB client
 _mongo_client: Optional[MongoClient] = None
 _mongo_db: Optional[Database] = None
+_mongo_ro_client: Optional[MongoClient] = None
+_mongo_ro_db: Optional[Database] = None
+
+
+class DecimalCodec(TypeCodec):
+    """Decode BSON Decimal128 straight to Python Decimal (and encode Decimal back)"""
+    python_type = Decimal
+    bson_type = Decimal128
+    
+    def transform_python(self, value: Decimal) -> Decimal128:
+        return Decimal128(value)
+    
+    def transform_bson(self, value: Decimal128) -> Decimal:
+        return value.to_decimal()
+
+
+# Codec options for billing databases: Decimal128 fields come back as Decimal
+BILLING_CODEC_OPTIONS = CodecOptions(type_registry=TypeRegistry([DecimalCodec()]))
 
 
-def init_mongodb():
-    """Initialize MongoDB connection and create indexes"""
+def init_mongodb(check_migrations: bool = True):
+    """
+    Initialize MongoDB connection and create indexes
+    
+    Args:
+        check_migrations: Raise MigrationRequired for unmigrated data. The
+            migration scripts pass False so they can connect to fix it.
+    """
     global _mongo_client, _mongo_db
     
     if _mongo_client is not None:
@@ -43,13 +79,15 @@ def init_mongodb():
         
         _mongo_client = MongoClient(
             mongo_url,
-            maxPoolSize=50,
-            minPoolSize=10,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
             maxIdleTimeMS=30000,
-            waitQueueTimeoutMS=10000,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            retryReads=True,
+            retryWrites=True,
         )
         
-        _mongo_db = _mongo_client[mongo_db_name]
+        _mongo_db = _mongo_client.get_database(mongo_db_name, codec_options=BILLING_CODEC_OPTIONS)
         
         # Test connection
         _mongo_client.server_info()
@@ -59,51 +97,136 @@ def init_mongodb():
         # Create indexes
         _create_indexes(_mongo_db)
         
+        if check_migrations:
+            # Refuse to serve wallets / usage logs still stored in the pre-micro-credit format
+            _check_credit_format(_mongo_db)
+            _check_usage_rollups(_mongo_db)
+        
         return _mongo_db
         
+    except MigrationRequired:
+        raise
     except Exception as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
         raise
 
 
+# Raw usage_logs are kept this many days (TTL index); reports over raw logs
+# must not ask for longer windows. Changing this requires a collMod on the
+# existing createdAt TTL index.
+USAGE_LOG_RETENTION_DAYS = 90
+
+# Covering index for usage history reads (see UsageServiceMongo._HISTORY_PROJECTION)
+USAGE_HISTORY_INDEX = 'usage_history_covering'
+USAGE_HISTORY_INDEX_KEYS = [
+    ('userId', ASCENDING),
+    ('createdAt', DESCENDING),
+    ('agentName', ASCENDING),
+    ('inputTokens', ASCENDING),
+    ('outputTokens', ASCENDING),
+    ('totalTokens', ASCENDING),
+    ('creditsUsedMicro', ASCENDING),
+    ('sessionId', ASCENDING),
+    ('_id', ASCENDING),
+]
+
+
+def _ensure_index(collection: Collection, keys, **kwargs) -> bool:
+    """Create one index, logging (not raising) on failure. Returns True on success."""
+    try:
+        collection.create_index(keys, **kwargs)
+        return True
+    except Exception as e:
+        logger.warning(f"Index creation failed on {collection.name} {keys}: {e}")
+        return False
+
+
 def _create_indexes(db: Database):
-    """Create all necessary indexes for billing collections"""
+    """
+    Create all necessary indexes for billing collections. Each index is created
+    on its own so one failure doesn't skip the rest.
+    
+    Raises:
+        RuntimeError: the usage history covering index (hinted by reads) could not be created
+    """
     logger.info("Creating MongoDB indexes...")
     
-    try:
-        # billing_users indexes
-        db.billing_users.create_index([('mongoUserId', ASCENDING)], unique=True, sparse=True, background=True)
-        db.billing_users.create_index([('email', ASCENDING)], unique=True, background=True)
-        db.billing_users.create_index([('wallet.creditsRemaining', ASCENDING)], background=True)
-        
-        # payments indexes
-        db.payments.create_index([('userId', ASCENDING), ('createdAt', DESCENDING)], background=True)
-        db.payments.create_index([('razorpayOrderId', ASCENDING)], unique=True, sparse=True, background=True)
-        db.payments.create_index([('status', ASCENDING), ('createdAt', DESCENDING)], background=True)
-        db.payments.create_index([('idempotencyKey', ASCENDING)], unique=True, sparse=True, background=True)
-        
-        # usage_logs indexes
-        db.usage_logs.create_index([('userId', ASCENDING), ('createdAt', DESCENDING)], background=True)
-        db.usage_logs.create_index([('agentName', ASCENDING), ('createdAt', DESCENDING)], background=True)
-        # TTL index for auto-cleanup (90 days)
-        db.usage_logs.create_index(
-            [('createdAt', ASCENDING)],
-            expireAfterSeconds=7776000,  # 90 days
-            background=True
-        )
-        
-        # subscription_plans indexes
-        db.subscription_plans.create_index([('sortOrder', ASCENDING), ('isActive', ASCENDING)], background=True)
-        
-        # audit_logs indexes (if migrated)
-        db.audit_logs.create_index([('adminUserId', ASCENDING), ('timestamp', DESCENDING)], background=True)
-        db.audit_logs.create_index([('action', ASCENDING), ('timestamp', DESCENDING)], background=True)
-        db.audit_logs.create_index([('targetType', ASCENDING), ('targetId', ASCENDING)], background=True)
-        
-        logger.info("✅ MongoDB indexes created successfully")
-        
-    except Exception as e:
-        logger.warning(f"Index creation warning (may already exist): {e}")
+    # billing_users indexes
+    _ensure_index(db.billing_users, [('mongoUserId', ASCENDING)], unique=True, sparse=True, background=True)
+    _ensure_index(db.billing_users, [('email', ASCENDING)], unique=True, background=True)
+    _ensure_index(db.billing_users, [('wallet.creditsRemaining', ASCENDING)], background=True)
+    
+    # payments indexes
+    _ensure_index(db.payments, [('userId', ASCENDING), ('createdAt', DESCENDING)], background=True)
+    _ensure_index(db.payments, [('razorpayOrderId', ASCENDING)], unique=True, sparse=True, background=True)
+    _ensure_index(db.payments, [('status', ASCENDING), ('createdAt', DESCENDING)], background=True)
+    _ensure_index(db.payments, [('idempotencyKey', ASCENDING)], unique=True, sparse=True, background=True)
+    
+    # usage_logs indexes
+    _ensure_index(db.usage_logs, [('userId', ASCENDING), ('createdAt', DESCENDING)], background=True)
+    _ensure_index(db.usage_logs, [('agentName', ASCENDING), ('createdAt', DESCENDING)], background=True)
+    # Covering index for usage history lists (every projected field + _id)
+    if not _ensure_index(db.usage_logs, USAGE_HISTORY_INDEX_KEYS, name=USAGE_HISTORY_INDEX, background=True):
+        raise RuntimeError(f"Index {USAGE_HISTORY_INDEX} is missing; usage history reads hint it")
+    # Only logs not yet run through migrate_usage_credits.py carry creditsUsed,
+    # so this sparse index stays empty once migrated (see _check_credit_format)
+    _ensure_index(db.usage_logs, [('creditsUsed', ASCENDING)], sparse=True, background=True)
+    # Time-window scans grouped by agent (get_top_agents)
+    _ensure_index(db.usage_logs, [('createdAt', DESCENDING), ('agentName', ASCENDING)], background=True)
+    # TTL index for auto-cleanup; per-day totals live on in usage_daily/agent_daily
+    _ensure_index(
+        db.usage_logs,
+        [('createdAt', ASCENDING)],
+        expireAfterSeconds=USAGE_LOG_RETENTION_DAYS * 86400,
+        background=True
+    )
+    
+    # Daily usage rollups (maintained by UsageServiceMongo)
+    _ensure_index(db.usage_daily, [('userId', ASCENDING), ('date', ASCENDING)], unique=True, background=True)
+    _ensure_index(db.usage_daily, [('date', ASCENDING)], background=True)
+    _ensure_index(db.agent_daily, [('agentName', ASCENDING), ('date', ASCENDING)], unique=True, background=True)
+    _ensure_index(db.agent_daily, [('date', ASCENDING)], background=True)
+    
+    # subscription_plans indexes
+    _ensure_index(db.subscription_plans, [('sortOrder', ASCENDING), ('isActive', ASCENDING)], background=True)
+    
+    # audit_logs indexes (if migrated)
+    _ensure_index(db.audit_logs, [('adminUserId', ASCENDING), ('timestamp', DESCENDING)], background=True)
+    _ensure_index(db.audit_logs, [('action', ASCENDING), ('timestamp', DESCENDING)], background=True)
+    _ensure_index(db.audit_logs, [('targetType', ASCENDING), ('targetId', ASCENDING)], background=True)
+    
+    logger.info("✅ MongoDB indexes created")
+
+
+def _check_credit_format(db: Database):
+    """
+    Raise MigrationRequired while any wallet or usage log still stores Decimal128 credits.
+    The billing services only read int64 micro-credits, so such a wallet would read
+    at 1/1,000,000 of its balance and such a log as zero credits. Both lookups are
+    indexed (wallet.creditsRemaining, sparse creditsUsed).
+    """
+    if db.billing_users.find_one({'wallet.creditsRemaining': {'$type': 'decimal'}}, {'_id': 1}) is not None:
+        logger.error("Wallets still store Decimal128 credits - run migrate_wallet_credits.py")
+        raise MigrationRequired("Wallets still store Decimal128 credits; run migrate_wallet_credits.py")
+    
+    if db.usage_logs.find_one({'creditsUsed': {'$exists': True}}, {'_id': 1}) is not None:
+        logger.error("Usage logs still store Decimal128 credits - run migrate_usage_credits.py")
+        raise MigrationRequired("Usage logs still store Decimal128 credits; run migrate_usage_credits.py")
+
+
+def _check_usage_rollups(db: Database):
+    """
+    Raise MigrationRequired when usage_logs has rows but usage_daily or
+    agent_daily is empty, i.e. the rollups were never backfilled. Reports
+    read the rollups, so they would silently miss all earlier usage.
+    """
+    if db.usage_logs.find_one({}, {'_id': 1}) is None:
+        return
+    
+    for rollup in ('usage_daily', 'agent_daily'):
+        if db[rollup].find_one({}, {'_id': 1}) is None:
+            logger.error(f"{rollup} has not been backfilled - run migrate_usage_rollups.py")
+            raise MigrationRequired(f"{rollup} has not been backfilled; run migrate_usage_rollups.py")
 
 
 def get_mongo_db() -> Database:
@@ -116,6 +239,29 @@ def get_mongo_db() -> Database:
     return _mongo_db
 
 
+def get_mongo_db_ro() -> Database:
+    """
+    Get the read-only MongoDB database for analytics/reporting reads.
+    Has its own connection pool and prefers secondaries, so reporting
+    load doesn't compete with wallet writes.
+    """
+    global _mongo_ro_client, _mongo_ro_db
+    
+    if _mongo_ro_db is None:
+        db = get_mongo_db()
+        _mongo_ro_client = MongoClient(
+            os.getenv('MONGO_URL', 'mongodb://localhost:27017'),
+            maxPoolSize=MONGO_RO_MAX_POOL_SIZE,
+            maxIdleTimeMS=30000,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            retryReads=True,
+            readPreference='secondaryPreferred',
+        )
+        _mongo_ro_db = _mongo_ro_client.get_database(db.name, codec_options=BILLING_CODEC_OPTIONS)
+    
+    return _mongo_ro_db
+
+
 @contextmanager
 def get_billing_collection(collection_name: str):
     """
@@ -161,6 +307,20 @@ def get_audit_logs() -> Collection:
     return get_mongo_db().audit_logs
 
 
+# ObjectId conversion utilities
+@lru_cache(maxsize=4096)
+def _parse_object_id(value: str) -> ObjectId:
+    """Parse a hex string into an ObjectId (memoized for hot paths)"""
+    return ObjectId(value)
+
+
+def to_object_id(value: Union[str, ObjectId]) -> ObjectId:
+    """Return value as an ObjectId, passing existing ObjectIds through unchanged"""
+    if isinstance(value, ObjectId):
+        return value
+    return _parse_object_id(value)
+
+
 # Decimal conversion utilities
 def decimal_to_decimal128(value) -> Decimal128:
     """Convert Python Decimal to MongoDB Decimal128"""
@@ -193,6 +353,27 @@ def decimal128_to_float(value) -> float:
     return float(value)
 
 
+# usage_logs and wallet credits are stored as int64 micro-credits (credits x 1,000,000)
+MICROCREDITS_PER_CREDIT = 1_000_000
+
+
+def to_micro(value) -> int:
+    """Convert credits (Decimal, Decimal128, float or str) to integer micro-credits"""
+    if value is None:
+        return 0
+    return int((decimal128_to_decimal(value) * MICROCREDITS_PER_CREDIT).to_integral_value())
+
+
+def from_micro(value) -> Decimal:
+    """Convert stored micro-credits to Decimal credits"""
+    return Decimal(value or 0) / MICROCREDITS_PER_CREDIT
+
+
+def micro_to_float(value) -> float:
+    """Convert stored micro-credits to float credits (for JSON serialization)"""
+    return (value or 0) / MICROCREDITS_PER_CREDIT
+
+
 # Transaction support (MongoDB 4.0+)
 @contextmanager
 def mongo_transaction():
@@ -241,8 +422,13 @@ def check_mongodb_health() -> dict:
 
 # Cleanup
 def close_mongodb():
-    """Close MongoDB connection"""
-    global _mongo_client, _mongo_db
+    """Close MongoDB connections (primary and read-only)"""
+    global _mongo_client, _mongo_db, _mongo_ro_client, _mongo_ro_db
+    
+    if _mongo_ro_client is not None:
+        _mongo_ro_client.close()
+        _mongo_ro_client = None
+        _mongo_ro_db = None
     
     if _mongo_client is not None:
         _mongo_client.close()
@@ -263,3 +449,14 @@ def get_db_session():
         yield get_mongo_db()
     
     return _db_context()
+
+
+def get_reader_session():
+    """
+    Read-only counterpart of get_db_session() for analytics/reporting paths
+    """
+    @contextmanager
+    def _db_context():
+        yield get_mongo_db_ro()
+    
+    return _db_context()
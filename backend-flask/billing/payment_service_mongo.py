@@ -12,9 +12,9 @@ from typing import Optional, Dict, List, Tuple
 import uuid
 
 from pymongo.database import Database
-from bson import ObjectId, Decimal128
+from bson import ObjectId
 
-from billing.mongodb import get_mongo_db, decimal_to_decimal128, decimal128_to_float
+from billing.mongodb import get_mongo_db, decimal_to_decimal128, decimal128_to_decimal, decimal128_to_float
 
 logger = logging.getLogger(__name__)
 
@@ -295,9 +295,7 @@ class PaymentServiceMongo:
         # For now, we trust the signature if provided
         
         # Update payment as completed
-        credits_to_add = payment['creditsToAdd']
-        if isinstance(credits_to_add, Decimal128):
-            credits_to_add = credits_to_add.to_decimal()
+        credits_to_add = decimal128_to_decimal(payment['creditsToAdd'])
         
         result = db.payments.find_one_and_update(
             {
@@ -322,7 +320,7 @@ class PaymentServiceMongo:
         from billing.wallet_service_mongo import WalletServiceMongo
         mongo_user_id = str(payment['mongoUserId'])
         success, new_balance = WalletServiceMongo.add_credits(
-            db, mongo_user_id, Decimal(str(credits_to_add)), source="payment"
+            db, mongo_user_id, credits_to_add, source="payment"
         )
         
         if not success:
@@ -400,11 +398,7 @@ class PaymentServiceMongo:
         if not payment:
             return None
         
-        credits = payment.get('creditsToAdd')
-        if isinstance(credits, Decimal128):
-            credits = float(credits.to_decimal())
-        else:
-            credits = float(credits or 0)
+        credits = decimal128_to_float(payment.get('creditsToAdd'))
         
         return {
             'id': payment['_id'],
@@ -16,6 +16,10 @@ USE_MONGODB = os.getenv('USE_MONGODB', 'true').lower() in ('true', '1', 'yes')
 logger.info(f"🔧 Billing Service Mode: {'MongoDB' if USE_MONGODB else 'PostgreSQL'}")
 
 
+class MigrationRequired(Exception):
+    """Billing data predates the running code and a migration script must be run first"""
+
+
 def get_wallet_service():
     """
     Get wallet service implementation
@@ -159,17 +163,30 @@ def init_billing():
     
     Returns:
         True if successful, False otherwise
+    
+    Raises:
+        MigrationRequired: stored billing data needs a migration script first
     """
     if USE_MONGODB:
         from billing.mongodb import init_mongodb
         try:
             init_mongodb()
+            
+            from billing.usage_service_mongo import UsageServiceMongo
+            UsageServiceMongo.start_flusher()
             logger.info("✅ MongoDB billing initialized")
             return True
+        except MigrationRequired:
+            raise
         except Exception as e:
             logger.error(f"MongoDB billing init failed: {e}")
             return False
     else:
         from billing.database import init_db
-        return init_db()
+        if not init_db():
+            return False
+        
+        from billing.usage_service import UsageService
+        UsageService.start_flusher()
+        return True
 
@@ -33,6 +33,16 @@ DEFAULT_PLANS = [
 ]
 
 
+def decode_setting_value(key: str, raw: Optional[str]) -> Any:
+    """Decode a stored setting value (JSON, else the raw string); the default if not stored"""
+    if raw is None:
+        return DEFAULT_SETTINGS.get(key, {}).get('value')
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return raw
+
+
 class SettingsService:
     """Service for managing billing settings"""
     
@@ -40,18 +50,7 @@ class SettingsService:
     def get_setting(db: Session, key: str) -> Any:
         """Get a single setting value"""
         setting = db.query(BillingSetting).filter(BillingSetting.key == key).first()
-        
-        if setting:
-            try:
-                return json.loads(setting.value)
-            except json.JSONDecodeError:
-                return setting.value
-        
-        # Return default if exists
-        if key in DEFAULT_SETTINGS:
-            return DEFAULT_SETTINGS[key]['value']
-        
-        return None
+        return decode_setting_value(key, setting.value if setting else None)
     
     @staticmethod
     def get_all_settings(db: Session) -> Dict[str, Any]:
@@ -70,13 +69,8 @@ class SettingsService:
         
         # Override with DB values
         for s in settings:
-            try:
-                value = json.loads(s.value)
-            except json.JSONDecodeError:
-                value = s.value
-            
             result[s.key] = {
-                'value': value,
+                'value': decode_setting_value(s.key, s.value),
                 'description': s.description or DEFAULT_SETTINGS.get(s.key, {}).get('description', ''),
                 'updated_at': s.updated_at.isoformat() if s.updated_at else None,
                 'updated_by': s.updated_by
@@ -115,8 +109,9 @@ class SettingsService:
     
     @staticmethod
     def get_daily_credit_cap(db: Session) -> int:
-        """Get daily credit cap"""
-        return SettingsService.get_setting(db, 'daily_credit_cap') or 100
+        """Get daily credit cap (a stored 0 blocks all usage)"""
+        cap = SettingsService.get_setting(db, 'daily_credit_cap')
+        return cap if cap is not None else 100
     
     @staticmethod
     def get_free_credits(db: Session) -> int:
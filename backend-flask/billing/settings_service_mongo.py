@@ -3,17 +3,57 @@ MongoDB-based Settings Service
 Manages admin-configurable billing settings and subscription plans
 """
 import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Any, Optional, Dict, List
+from typing import Any, Optional, Dict, List, Tuple, Union
 from decimal import Decimal
 
+from pymongo import ReturnDocument, UpdateOne
 from pymongo.database import Database
 from bson import ObjectId, Decimal128
 
-from billing.mongodb import get_mongo_db, decimal_to_decimal128, decimal128_to_float
+from billing.mongodb import get_mongo_db, decimal_to_decimal128, decimal128_to_float, to_object_id
 
 logger = logging.getLogger(__name__)
 
+# How long get_all_plans results are served from memory
+PLANS_CACHE_TTL_SECONDS = 300
+
+# How long hot-path settings (tokens_per_credit, daily_credit_cap) are served from memory
+SETTINGS_CACHE_TTL_SECONDS = 60
+
+# Server-side ISO-8601 rendering of setting timestamps
+_SETTINGS_ISO_PROJECTION = {
+    'value': 1,
+    'description': 1,
+    'updatedBy': 1,
+    'updatedAtIso': {'$dateToString': {'format': '%Y-%m-%dT%H:%M:%S.%L', 'date': '$updatedAt'}}
+}
+
+# Plan credits are stored as integer units of 1/10000 credit
+PLAN_CREDIT_SCALE = 10000
+
+
+def plan_credits_to_units(value) -> int:
+    """Convert a credit amount to integer plan credit units"""
+    return int((Decimal(str(value or 0)) * PLAN_CREDIT_SCALE).to_integral_value())
+
+
+def plan_units_to_credits(value) -> float:
+    """Convert stored plan credits to float (legacy Decimal128 values still accepted)"""
+    if isinstance(value, (Decimal, Decimal128)):
+        return decimal128_to_float(value)
+    return (value or 0) / PLAN_CREDIT_SCALE
+
+
+# How long a "not suspended" answer is trusted before re-checking
+SUSPENSION_CACHE_TTL_SECONDS = 10
+
+# Max cached "not suspended" answers
+SUSPENSION_CACHE_SIZE = 50000
+
 
 # Default settings configuration
 DEFAULT_SETTINGS = {
@@ -43,6 +83,20 @@ class SettingsServiceMongo:
         'payment_enabled': True
     }
     
+    # key -> (cached_at, value); entries are dropped by update_setting
+    _settings_cache: Dict[str, Tuple[float, Any]] = {}
+    
+    @staticmethod
+    def _get_cached_setting(db: Database, key: str, default: Any = None) -> Any:
+        """get_setting() served from memory for SETTINGS_CACHE_TTL_SECONDS"""
+        cached = SettingsServiceMongo._settings_cache.get(key)
+        if cached and time.monotonic() - cached[0] < SETTINGS_CACHE_TTL_SECONDS:
+            return cached[1]
+        
+        value = SettingsServiceMongo.get_setting(db, key, default)
+        SettingsServiceMongo._settings_cache[key] = (time.monotonic(), value)
+        return value
+    
     @staticmethod
     def get_setting(db: Database, key: str, default: Any = None) -> Any:
         """
@@ -65,7 +119,7 @@ class SettingsServiceMongo:
         return setting.get('value', default)
     
     @staticmethod
-    def update_setting(db: Database, key: str, value: Any, updated_by: str = None) -> bool:
+    def update_setting(db: Database, key: str, value: Any, updated_by: str = None) -> Optional[Dict]:
         """
         Update or create a setting
         
@@ -76,9 +130,9 @@ class SettingsServiceMongo:
             updated_by: Admin email who updated
             
         Returns:
-            Success boolean
+            Updated setting document ({_id, value, updatedAt, updatedBy}) or None
         """
-        result = db.settings.update_one(
+        setting = db.settings.find_one_and_update(
             {'_id': key},
             {
                 '$set': {
@@ -90,11 +144,14 @@ class SettingsServiceMongo:
                     'description': SettingsServiceMongo._get_description(key)
                 }
             },
-            upsert=True
+            projection={'value': 1, 'updatedAt': 1, 'updatedBy': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
         
+        SettingsServiceMongo._settings_cache.pop(key, None)
         logger.info(f"Updated setting '{key}' = {value} by {updated_by}")
-        return result.acknowledged
+        return setting
     
     @staticmethod
     def get_all_settings(db: Database) -> Dict[str, Any]:
@@ -120,12 +177,12 @@ class SettingsServiceMongo:
             }
         
         # Override with database values
-        for setting in db.settings.find():
+        for setting in db.settings.aggregate([{'$project': _SETTINGS_ISO_PROJECTION}]):
             key = setting['_id']
             result[key] = {
                 'value': setting.get('value'),
                 'description': setting.get('description', DEFAULT_SETTINGS.get(key, {}).get('description', '')),
-                'updated_at': setting.get('updatedAt').isoformat() if setting.get('updatedAt') else None,
+                'updated_at': setting.get('updatedAtIso'),
                 'updated_by': setting.get('updatedBy')
             }
         
@@ -142,7 +199,7 @@ class SettingsServiceMongo:
         Returns:
             List of setting dicts with metadata
         """
-        settings = list(db.settings.find())
+        settings = list(db.settings.aggregate([{'$project': _SETTINGS_ISO_PROJECTION}]))
         
         # Add any missing defaults
         existing_keys = {s['_id'] for s in settings}
@@ -152,7 +209,7 @@ class SettingsServiceMongo:
                     '_id': key,
                     'value': info['value'],
                     'description': info['description'],
-                    'updatedAt': None,
+                    'updatedAtIso': None,
                     'updatedBy': None
                 })
         
@@ -162,7 +219,7 @@ class SettingsServiceMongo:
                 'key': s['_id'],
                 'value': s['value'],
                 'description': s.get('description', ''),
-                'updated_at': s.get('updatedAt'),
+                'updated_at': s.get('updatedAtIso'),
                 'updated_by': s.get('updatedBy')
             }
             for s in settings
@@ -172,7 +229,7 @@ class SettingsServiceMongo:
     @staticmethod
     def get_tokens_per_credit(db: Database) -> int:
         """Get tokens per credit conversion rate"""
-        return int(SettingsServiceMongo.get_setting(db, 'tokens_per_credit', 1000))
+        return int(SettingsServiceMongo._get_cached_setting(db, 'tokens_per_credit', 1000))
     
     @staticmethod
     def get_free_credits(db: Database) -> int:
@@ -187,7 +244,7 @@ class SettingsServiceMongo:
     @staticmethod
     def get_daily_credit_cap(db: Database) -> int:
         """Get daily credit usage cap"""
-        return int(SettingsServiceMongo.get_setting(db, 'daily_credit_cap', 100))
+        return int(SettingsServiceMongo._get_cached_setting(db, 'daily_credit_cap', 100))
     
     @staticmethod
     def get_max_tokens_per_query(db: Database) -> int:
@@ -213,6 +270,14 @@ class PlanServiceMongo:
          'amount_paise': 199900, 'credits': 2000, 'bonus_credits': 500, 'sort_order': 3},
     ]
     
+    # active_only -> (cached_at, plan dicts); cleared on any plan change
+    _plans_cache: Dict[bool, Tuple[float, List[Dict]]] = {}
+    
+    @staticmethod
+    def _invalidate_plans_cache():
+        """Drop cached plan lists after an admin change"""
+        PlanServiceMongo._plans_cache.clear()
+    
     @staticmethod
     def get_all_plans(db: Database, active_only: bool = False) -> List[Dict]:
         """
@@ -225,15 +290,24 @@ class PlanServiceMongo:
         Returns:
             List of plan dicts
         """
+        cached = PlanServiceMongo._plans_cache.get(active_only)
+        if cached and time.monotonic() - cached[0] < PLANS_CACHE_TTL_SECONDS:
+            return [dict(p) for p in cached[1]]
+        
         query = {'isActive': True} if active_only else {}
         plans = list(db.subscription_plans.find(query).sort('sortOrder', 1))
         
-        # If no plans, seed defaults
+        # If no plans, seed defaults and re-read: a concurrent seeder may have
+        # inserted some or all of them, so what we upserted isn't the full list.
+        # Don't cache this pass - the next call caches the settled collection.
         if not plans:
             PlanServiceMongo.seed_default_plans(db)
             plans = list(db.subscription_plans.find(query).sort('sortOrder', 1))
+            return [PlanServiceMongo._plan_to_dict(p) for p in plans]
         
-        return [PlanServiceMongo._plan_to_dict(p) for p in plans]
+        result = [PlanServiceMongo._plan_to_dict(p) for p in plans]
+        PlanServiceMongo._plans_cache[active_only] = (time.monotonic(), result)
+        return [dict(p) for p in result]
     
     @staticmethod
     def get_plan(db: Database, plan_id: str) -> Optional[Dict]:
@@ -258,8 +332,8 @@ class PlanServiceMongo:
             'name': plan_data['name'],
             'description': plan_data.get('description', ''),
             'amountPaise': plan_data['amount_paise'],
-            'credits': Decimal128(str(plan_data['credits'])),
-            'bonusCredits': Decimal128(str(plan_data.get('bonus_credits', 0))),
+            'credits': plan_credits_to_units(plan_data['credits']),
+            'bonusCredits': plan_credits_to_units(plan_data.get('bonus_credits', 0)),
             'isActive': plan_data.get('is_active', True),
             'sortOrder': plan_data.get('sort_order', 0),
             'createdAt': datetime.utcnow(),
@@ -267,6 +341,7 @@ class PlanServiceMongo:
         }
         
         db.subscription_plans.insert_one(plan)
+        PlanServiceMongo._invalidate_plans_cache()
         logger.info(f"Created plan: {plan['_id']}")
         return PlanServiceMongo._plan_to_dict(plan)
     
@@ -292,9 +367,9 @@ class PlanServiceMongo:
         if 'amount_paise' in plan_data:
             update_fields['amountPaise'] = plan_data['amount_paise']
         if 'credits' in plan_data:
-            update_fields['credits'] = Decimal128(str(plan_data['credits']))
+            update_fields['credits'] = plan_credits_to_units(plan_data['credits'])
         if 'bonus_credits' in plan_data:
-            update_fields['bonusCredits'] = Decimal128(str(plan_data['bonus_credits']))
+            update_fields['bonusCredits'] = plan_credits_to_units(plan_data['bonus_credits'])
         if 'is_active' in plan_data:
             update_fields['isActive'] = plan_data['is_active']
         if 'sort_order' in plan_data:
@@ -307,6 +382,7 @@ class PlanServiceMongo:
         )
         
         if result:
+            PlanServiceMongo._invalidate_plans_cache()
             logger.info(f"Updated plan: {plan_id}")
             return PlanServiceMongo._plan_to_dict(result)
         return None
@@ -338,28 +414,49 @@ class PlanServiceMongo:
             if success:
                 logger.info(f"Deleted plan: {plan_id}")
         
+        if success:
+            PlanServiceMongo._invalidate_plans_cache()
+        
         return success
     
     @staticmethod
-    def seed_default_plans(db: Database):
-        """Seed default plans if none exist"""
-        for plan_data in PlanServiceMongo.DEFAULT_PLANS:
-            existing = db.subscription_plans.find_one({'_id': plan_data['id']})
-            if not existing:
-                plan = {
-                    '_id': plan_data['id'],
-                    'name': plan_data['name'],
-                    'description': plan_data['description'],
-                    'amountPaise': plan_data['amount_paise'],
-                    'credits': Decimal128(str(plan_data['credits'])),
-                    'bonusCredits': Decimal128(str(plan_data['bonus_credits'])),
-                    'isActive': True,
-                    'sortOrder': plan_data['sort_order'],
-                    'createdAt': datetime.utcnow(),
-                    'updatedAt': datetime.utcnow()
-                }
-                db.subscription_plans.insert_one(plan)
-        logger.info("Seeded default subscription plans")
+    def seed_default_plans(db: Database) -> int:
+        """
+        Seed default plans if none exist (single bulk upsert, idempotent)
+        
+        Returns:
+            Number of plans this call inserted (0 if another process got there first)
+        """
+        now = datetime.utcnow()
+        plans = [
+            {
+                '_id': plan_data['id'],
+                'name': plan_data['name'],
+                'description': plan_data['description'],
+                'amountPaise': plan_data['amount_paise'],
+                'credits': plan_credits_to_units(plan_data['credits']),
+                'bonusCredits': plan_credits_to_units(plan_data['bonus_credits']),
+                'isActive': True,
+                'sortOrder': plan_data['sort_order'],
+                'createdAt': now,
+                'updatedAt': now
+            }
+            for plan_data in PlanServiceMongo.DEFAULT_PLANS
+        ]
+        ops = [
+            UpdateOne(
+                {'_id': plan['_id']},
+                {'$setOnInsert': {k: v for k, v in plan.items() if k != '_id'}},
+                upsert=True
+            )
+            for plan in plans
+        ]
+        
+        result = db.subscription_plans.bulk_write(ops, ordered=False)
+        PlanServiceMongo._invalidate_plans_cache()
+        logger.info(f"Seeded {result.upserted_count} default subscription plans")
+        
+        return result.upserted_count
     
     @staticmethod
     def _plan_to_dict(plan: dict) -> Dict:
@@ -367,19 +464,8 @@ class PlanServiceMongo:
         if not plan:
             return None
         
-        credits = plan.get('credits')
-        bonus_credits = plan.get('bonusCredits')
-        
-        # Handle Decimal128 conversion
-        if isinstance(credits, Decimal128):
-            credits = float(credits.to_decimal())
-        else:
-            credits = float(credits or 0)
-            
-        if isinstance(bonus_credits, Decimal128):
-            bonus_credits = float(bonus_credits.to_decimal())
-        else:
-            bonus_credits = float(bonus_credits or 0)
+        credits = plan_units_to_credits(plan.get('credits'))
+        bonus_credits = plan_units_to_credits(plan.get('bonusCredits'))
         
         return {
             'id': plan['_id'],
@@ -400,36 +486,68 @@ class PlanServiceMongo:
 class UserManagementServiceMongo:
     """MongoDB-based user management service"""
     
+    # mongo_user_id -> monotonic time at which "not suspended" was confirmed, LRU-bounded
+    _not_suspended_cache: "OrderedDict[str, float]" = OrderedDict()
+    _not_suspended_cache_lock = threading.Lock()
+    
     @staticmethod
-    def suspend_user(db: Database, mongo_user_id: str) -> bool:
+    def suspend_user(db: Database, mongo_user_id: Union[str, ObjectId]) -> bool:
         """Suspend a user"""
         result = db.billing_users.update_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
+            {'mongoUserId': to_object_id(mongo_user_id)},
             {'$set': {'isSuspended': True}}
         )
+        UserManagementServiceMongo._forget_not_suspended(str(mongo_user_id))
         if result.modified_count > 0:
             logger.info(f"Suspended user: {mongo_user_id}")
             return True
         return False
     
     @staticmethod
-    def unsuspend_user(db: Database, mongo_user_id: str) -> bool:
+    def unsuspend_user(db: Database, mongo_user_id: Union[str, ObjectId]) -> bool:
         """Unsuspend a user"""
         result = db.billing_users.update_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
+            {'mongoUserId': to_object_id(mongo_user_id)},
             {'$set': {'isSuspended': False}}
         )
+        UserManagementServiceMongo._forget_not_suspended(str(mongo_user_id))
         if result.modified_count > 0:
             logger.info(f"Unsuspended user: {mongo_user_id}")
             return True
         return False
     
     @staticmethod
-    def is_user_suspended(db: Database, mongo_user_id: str) -> bool:
-        """Check if user is suspended"""
-        user = db.billing_users.find_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'isSuspended': 1}
-        )
-        return user.get('isSuspended', False) if user else False
-
+    def _forget_not_suspended(cache_key: str) -> None:
+        """Drop a cached "not suspended" answer"""
+        with UserManagementServiceMongo._not_suspended_cache_lock:
+            UserManagementServiceMongo._not_suspended_cache.pop(cache_key, None)
+    
+    @staticmethod
+    def is_user_suspended(db: Database, mongo_user_id: Union[str, ObjectId]) -> bool:
+        """
+        Check if user is suspended.
+        A limit-1 count found through the unique mongoUserId index (one document
+        fetched, none returned); negative answers are cached briefly.
+        """
+        cache_key = str(mongo_user_id)
+        with UserManagementServiceMongo._not_suspended_cache_lock:
+            checked_at = UserManagementServiceMongo._not_suspended_cache.get(cache_key)
+            if checked_at is not None and time.monotonic() - checked_at < SUSPENSION_CACHE_TTL_SECONDS:
+                UserManagementServiceMongo._not_suspended_cache.move_to_end(cache_key)
+                return False
+        
+        suspended = db.billing_users.count_documents(
+            {'mongoUserId': to_object_id(mongo_user_id), 'isSuspended': True},
+            limit=1
+        ) > 0
+        
+        with UserManagementServiceMongo._not_suspended_cache_lock:
+            if suspended:
+                UserManagementServiceMongo._not_suspended_cache.pop(cache_key, None)
+            else:
+                UserManagementServiceMongo._not_suspended_cache[cache_key] = time.monotonic()
+                UserManagementServiceMongo._not_suspended_cache.move_to_end(cache_key)
+                if len(UserManagementServiceMongo._not_suspended_cache) > SUSPENSION_CACHE_SIZE:
+                    UserManagementServiceMongo._not_suspended_cache.popitem(last=False)
+        
+        return suspended
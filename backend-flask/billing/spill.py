@@ -0,0 +1,69 @@
+"""
+Spill files for usage logs that could not be written to the billing database.
+Records are appended as JSON lines and replayed by the usage services on
+their next start, so a database outage doesn't silently drop billing logs.
+"""
+import logging
+import os
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Directory for spill files (one per billing backend)
+SPILL_DIR = os.getenv(
+    'BILLING_SPILL_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'temp')
+)
+
+
+def spill_path(name: str) -> str:
+    """Path of the spill file for a usage service"""
+    return os.path.join(SPILL_DIR, f"{name}.spill.jsonl")
+
+
+def append(path: str, lines: List[str]) -> bool:
+    """
+    Append JSON lines to a spill file in a single write.
+
+    Returns:
+        True if the records reached the file
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(''.join(line + '\n' for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+        return True
+    except OSError as e:
+        logger.error(f"Could not write spill file {path}: {e}")
+        return False
+
+
+def claim(path: str) -> Optional[str]:
+    """
+    Atomically take over a spill file for replay, so concurrent workers don't
+    replay the same records. Returns the claimed path, or None if there is
+    nothing to replay.
+    """
+    claimed = f"{path}.{os.getpid()}"
+    try:
+        os.replace(path, claimed)
+    except FileNotFoundError:
+        return None
+    return claimed
+
+
+def read(claimed: str) -> List[str]:
+    """Non-empty lines of a claimed spill file"""
+    with open(claimed, encoding='utf-8') as f:
+        return [line for line in f.read().splitlines() if line.strip()]
+
+
+def release(claimed: str, path: str, replayed: bool) -> None:
+    """Delete a claimed file once replayed, otherwise hand its records back to the spill file"""
+    if not replayed and not append(path, read(claimed)):
+        # Keep the claimed file rather than lose the records
+        logger.error(f"Spilled usage logs left in {claimed}")
+        return
+    os.remove(claimed)
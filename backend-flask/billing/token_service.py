@@ -2,14 +2,22 @@
 Token Service - Converts tokens to credits
 Reads tokens_per_credit from database settings
 """
-from decimal import Decimal, ROUND_UP
+from decimal import Decimal
 import logging
 
+from billing.service_factory import USE_MONGODB, get_database
+from billing.settings_service_mongo import SettingsServiceMongo
+from billing.settings_service import SettingsService
+from billing.database import get_db_session
+
 logger = logging.getLogger(__name__)
 
 # Default conversion rate (used as fallback)
 DEFAULT_TOKENS_PER_CREDIT = 1000
 
+# Credits are tracked to 4 decimal places
+CREDIT_SCALE = 10000
+
 # Maximum tokens allowed per single run (guardrail)
 MAX_TOKENS_PER_RUN = 4000
 
@@ -33,20 +41,15 @@ def get_tokens_per_credit(db=None) -> int:
     try:
         # Try to get from database
         if db is not None:
-            from billing.settings_service_mongo import SettingsServiceMongo
             return SettingsServiceMongo.get_tokens_per_credit(db)
         
         # Try to get fresh db connection
-        from billing.service_factory import USE_MONGODB, get_database
         if USE_MONGODB:
             db = get_database()
-            from billing.settings_service_mongo import SettingsServiceMongo
             rate = SettingsServiceMongo.get_tokens_per_credit(db)
             _cached_tokens_per_credit = rate
             return rate
         else:
-            from billing.settings_service import SettingsService
-            from billing.database import get_db_session
             with get_db_session() as db:
                 rate = SettingsService.get_tokens_per_credit(db)
                 _cached_tokens_per_credit = rate
@@ -56,6 +59,22 @@ def get_tokens_per_credit(db=None) -> int:
         return _cached_tokens_per_credit or DEFAULT_TOKENS_PER_CREDIT
 
 
+def _credits_scaled(tokens: int, tokens_per_credit: int) -> int:
+    """Credits for tokens in 1/10000 units, rounded up (pure integer math)"""
+    return (tokens * CREDIT_SCALE + tokens_per_credit - 1) // tokens_per_credit
+
+
+def tokens_to_credit_units(tokens: int, db=None) -> int:
+    """
+    Convert token count to integer credit units (credits x CREDIT_SCALE).
+    Rounds UP like tokens_to_credits.
+    """
+    if tokens <= 0:
+        return 0
+    
+    return _credits_scaled(tokens, get_tokens_per_credit(db))
+
+
 def tokens_to_credits(tokens: int, db=None) -> Decimal:
     """
     Convert token count to credits.
@@ -72,9 +91,8 @@ def tokens_to_credits(tokens: int, db=None) -> Decimal:
         return Decimal('0.0000')
     
     tokens_per_credit = get_tokens_per_credit(db)
-    credits = Decimal(tokens) / Decimal(tokens_per_credit)
     # Round up to 4 decimal places
-    return credits.quantize(Decimal('0.0001'), rounding=ROUND_UP)
+    return Decimal(_credits_scaled(tokens, tokens_per_credit)).scaleb(-4)
 
 
 def credits_to_tokens(credits: Decimal, db=None) -> int:
@@ -1,22 +1,314 @@
 """
 Usage Service - Logs token/credit usage per query
 """
+import atexit
+import json
 import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
 from decimal import Decimal
-from datetime import datetime, timedelta
-from typing import List, Optional
-from sqlalchemy import func, desc
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import func, desc, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
-from billing.models import User, UsageLog
-from billing.token_service import tokens_to_credits
+from billing.models import User, UsageLog, DailyUsageTotal, generate_uuid
+from billing.database import get_db_session
+from billing.token_service import tokens_to_credit_units, CREDIT_SCALE
+from billing import spill
 
 logger = logging.getLogger(__name__)
 
+# Background flush configuration for usage logs
+FLUSH_INTERVAL_SECONDS = 0.5
+FLUSH_BATCH_SIZE = 100
+MAX_QUEUED_LOGS = 10000
+
+# A batch whose write fails is retried after FLUSH_RETRY_SECONDS, doubling
+# each time; after FLUSH_MAX_ATTEMPTS it is spilled to disk and replayed on
+# the next start
+FLUSH_RETRY_SECONDS = 1.0
+FLUSH_MAX_ATTEMPTS = 5
+SPILL_PATH = spill.spill_path('usage_logs')
+
+# UsageLog columns written to the spill file
+_SPILL_COLUMNS = (
+    'id', 'user_id', 'chatbot_id', 'input_tokens', 'output_tokens', 'total_tokens',
+    'credits_used', 'credits_used_int', 'session_id', 'query_text', 'created_at', 'created_date'
+)
+
+# PostgreSQL to_char() pattern matching datetime.isoformat()
+ISO_TIMESTAMP_FORMAT = 'YYYY-MM-DD"T"HH24:MI:SS.US'
+
+# Max cached mongo_user_id -> billing user id mappings
+USER_ID_CACHE_SIZE = 10000
+
 
 class UsageService:
     """Service for logging and querying usage data"""
     
+    # Pending usage logs, written in batches by the flusher thread
+    _queue: "queue.Queue[UsageLog]" = queue.Queue(maxsize=MAX_QUEUED_LOGS)
+    _flush_lock = threading.Lock()
+    _flusher: Optional[threading.Thread] = None
+    # Failed batches awaiting retry: (retry_at, attempts, rows); guarded by _flush_lock
+    _retry: List[Tuple[float, int, List[UsageLog]]] = []
+    
+    # billing user id -> credits of logs queued or awaiting retry (not yet in the database)
+    _pending_credits: Dict[str, Decimal] = {}
+    _pending_lock = threading.Lock()
+    
+    # mongo_user_id -> billing user id (immutable once assigned), LRU-bounded
+    _uid_cache: "OrderedDict[str, str]" = OrderedDict()
+    _uid_cache_lock = threading.Lock()
+    
+    @staticmethod
+    def resolve_user_id(db: Session, mongo_user_id: str) -> Optional[str]:
+        """
+        Resolve a MongoDB user ID to the internal billing user ID.
+        Results are cached; only the ID column is selected on a miss.
+        """
+        with UsageService._uid_cache_lock:
+            user_id = UsageService._uid_cache.get(mongo_user_id)
+            if user_id is not None:
+                UsageService._uid_cache.move_to_end(mongo_user_id)
+                return user_id
+        
+        user_id = db.query(User.id).filter(User.mongo_user_id == mongo_user_id).scalar()
+        
+        if user_id is not None:
+            with UsageService._uid_cache_lock:
+                UsageService._uid_cache[mongo_user_id] = user_id
+                if len(UsageService._uid_cache) > USER_ID_CACHE_SIZE:
+                    UsageService._uid_cache.popitem(last=False)
+        
+        return user_id
+    
+    @staticmethod
+    def invalidate_user_id(mongo_user_id: str) -> None:
+        """Drop a cached user ID mapping (call when a billing user is deleted)"""
+        with UsageService._uid_cache_lock:
+            UsageService._uid_cache.pop(mongo_user_id, None)
+    
+    @staticmethod
+    def start_flusher() -> None:
+        """
+        Start the background thread that batches queued usage logs.
+        Safe to call multiple times - only one flusher is started.
+        """
+        if UsageService._flusher is not None and UsageService._flusher.is_alive():
+            return
+        
+        UsageService._replay_spill()
+        
+        UsageService._flusher = threading.Thread(
+            target=UsageService._flush_loop,
+            name="usage-log-flusher",
+            daemon=True
+        )
+        UsageService._flusher.start()
+        atexit.register(UsageService._flush_at_exit)
+        logger.info("Usage log flusher started")
+    
+    @staticmethod
+    def _flush_loop() -> None:
+        """Drain the queue every FLUSH_INTERVAL_SECONDS or FLUSH_BATCH_SIZE rows, retrying failed batches"""
+        while True:
+            try:
+                first = UsageService._queue.get(timeout=UsageService._next_retry_in())
+            except queue.Empty:
+                first = None
+            
+            with UsageService._flush_lock:
+                UsageService._retry_due()
+                if first is None:
+                    continue
+                
+                batch = [first]
+                deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+                
+                while len(batch) < FLUSH_BATCH_SIZE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(UsageService._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                
+                UsageService._write_batch(batch)
+    
+    @staticmethod
+    def _next_retry_in() -> Optional[float]:
+        """Seconds until the earliest failed batch is due (None if there are none)"""
+        with UsageService._flush_lock:
+            if not UsageService._retry:
+                return None
+            return max(0.0, min(retry_at for retry_at, _, _ in UsageService._retry) - time.monotonic())
+    
+    @staticmethod
+    def _retry_due() -> None:
+        """Re-write failed batches whose retry time has come (caller holds _flush_lock)"""
+        now = time.monotonic()
+        due = [entry for entry in UsageService._retry if entry[0] <= now]
+        UsageService._retry = [entry for entry in UsageService._retry if entry[0] > now]
+        for _, attempts, rows in due:
+            UsageService._write_batch(rows, attempts)
+    
+    @staticmethod
+    def _write_batch(rows: List[UsageLog], attempts: int = 0) -> bool:
+        """
+        Insert a batch of usage logs and their rollup increments in a single transaction.
+        A failed batch is queued for retry, and spilled to disk once it has
+        failed FLUSH_MAX_ATTEMPTS times (caller holds _flush_lock).
+        
+        Returns:
+            True if the batch was written
+        """
+        if not rows:
+            return True
+        
+        try:
+            with get_db_session() as session:
+                session.bulk_save_objects(rows)
+                UsageService._update_daily_totals(session, rows)
+        except Exception as e:
+            attempts += 1
+            if attempts < FLUSH_MAX_ATTEMPTS:
+                logger.error(f"Failed to flush {len(rows)} usage logs (attempt {attempts}), will retry: {e}")
+                delay = FLUSH_RETRY_SECONDS * 2 ** (attempts - 1)
+                UsageService._retry.append((time.monotonic() + delay, attempts, rows))
+                return False
+            
+            if not spill.append(SPILL_PATH, [UsageService._to_spill(row) for row in rows]):
+                logger.error(f"Failed to flush or spill {len(rows)} usage logs, will retry: {e}")
+                UsageService._retry.append((time.monotonic() + FLUSH_RETRY_SECONDS * 2 ** attempts, attempts, rows))
+                return False
+            logger.error(f"Failed to flush {len(rows)} usage logs after {attempts} attempts, spilled to {SPILL_PATH}: {e}")
+        else:
+            logger.debug(f"Flushed {len(rows)} usage logs")
+        
+        UsageService._release_pending(rows)
+        return True
+    
+    @staticmethod
+    def _to_spill(row: UsageLog) -> str:
+        """Serialize a usage log as a spill file line"""
+        return json.dumps({column: getattr(row, column) for column in _SPILL_COLUMNS}, default=str)
+    
+    @staticmethod
+    def _from_spill(line: str) -> UsageLog:
+        """Rebuild a usage log from a spill file line"""
+        values = json.loads(line)
+        values['credits_used'] = Decimal(values['credits_used'])
+        values['created_at'] = datetime.fromisoformat(values['created_at'])
+        values['created_date'] = date.fromisoformat(values['created_date'])
+        return UsageLog(**values)
+    
+    @staticmethod
+    def _replay_spill() -> None:
+        """Write usage logs spilled by an earlier run; they go back to the spill file if this fails"""
+        claimed = spill.claim(SPILL_PATH)
+        if claimed is None:
+            return
+        
+        rows = [UsageService._from_spill(line) for line in spill.read(claimed)]
+        try:
+            with get_db_session() as session:
+                session.bulk_save_objects(rows)
+                UsageService._update_daily_totals(session, rows)
+            logger.info(f"Replayed {len(rows)} spilled usage logs")
+            spill.release(claimed, SPILL_PATH, replayed=True)
+        except Exception as e:
+            logger.error(f"Failed to replay {len(rows)} spilled usage logs: {e}")
+            spill.release(claimed, SPILL_PATH, replayed=False)
+    
+    @staticmethod
+    def _release_pending(rows: List[UsageLog]) -> None:
+        """Stop counting rows as pending once they are in the database (or spilled)"""
+        with UsageService._pending_lock:
+            for row in rows:
+                remaining = UsageService._pending_credits.get(row.user_id, Decimal('0')) - row.credits_used
+                if remaining > 0:
+                    UsageService._pending_credits[row.user_id] = remaining
+                else:
+                    UsageService._pending_credits.pop(row.user_id, None)
+    
+    @staticmethod
+    def pending_credits(user_id: str) -> Decimal:
+        """
+        Credits of this process's usage logs for a billing user that are queued
+        but not yet written. Daily cap checks add this to the stored totals
+        instead of flushing the whole queue on the request thread.
+        """
+        with UsageService._pending_lock:
+            return UsageService._pending_credits.get(user_id, Decimal('0'))
+    
+    @staticmethod
+    def _update_daily_totals(db: Session, rows: List[UsageLog]) -> None:
+        """Add usage logs to the daily_usage_totals rollup (one upsert per batch)"""
+        totals = {}
+        for row in rows:
+            key = (row.user_id, row.created_date)
+            queries, tokens, credits, credits_int = totals.get(key, (0, 0, Decimal('0'), 0))
+            totals[key] = (
+                queries + 1,
+                tokens + row.total_tokens,
+                credits + row.credits_used,
+                credits_int + row.credits_used_int
+            )
+        
+        stmt = pg_insert(DailyUsageTotal).values([
+            {
+                'user_id': user_id, 'date': day, 'queries': queries, 'tokens': tokens,
+                'credits': credits, 'credits_int': credits_int
+            }
+            for (user_id, day), (queries, tokens, credits, credits_int) in totals.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'date'],
+            set_={
+                'queries': DailyUsageTotal.queries + stmt.excluded.queries,
+                'tokens': DailyUsageTotal.tokens + stmt.excluded.tokens,
+                'credits': DailyUsageTotal.credits + stmt.excluded.credits,
+                'credits_int': DailyUsageTotal.credits_int + stmt.excluded.credits_int
+            }
+        )
+        db.execute(stmt)
+    
+    @staticmethod
+    def flush_now() -> None:
+        """
+        Synchronously write all queued usage logs and pending retries (used at exit).
+        Daily cap checks don't flush; they add pending_credits() instead.
+        """
+        with UsageService._flush_lock:
+            rows = []
+            while True:
+                try:
+                    rows.append(UsageService._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            retry = UsageService._retry
+            UsageService._retry = []
+            for _, attempts, failed in retry:
+                UsageService._write_batch(failed, attempts)
+            UsageService._write_batch(rows)
+    
+    @staticmethod
+    def _flush_at_exit() -> None:
+        """Final flush; batches that still fail are spilled instead of being dropped with the process"""
+        UsageService.flush_now()
+        with UsageService._flush_lock:
+            retry = UsageService._retry
+            UsageService._retry = []
+            for _, _, rows in retry:
+                UsageService._write_batch(rows, FLUSH_MAX_ATTEMPTS - 1)
+    
     @staticmethod
     def log_usage(
         db: Session,
@@ -40,29 +332,50 @@ class UsageService:
             query_text: Optional truncated query for debugging
             
         Returns:
-            UsageLog object or None if failed
+            UsageLog object or None if failed. When the flusher is running
+            the log is queued and written shortly after this returns.
         """
-        user = db.query(User).filter(User.mongo_user_id == mongo_user_id).first()
+        user_id = UsageService.resolve_user_id(db, mongo_user_id)
         
-        if user is None:
+        if user_id is None:
             logger.warning(f"Cannot log usage - user not found: {mongo_user_id}")
             return None
         
         total_tokens = input_tokens + output_tokens
-        credits_used = tokens_to_credits(total_tokens)
+        credits_used_int = tokens_to_credit_units(total_tokens)
+        credits_used = Decimal(credits_used_int).scaleb(-4)
+        now = datetime.utcnow()
         
         usage_log = UsageLog(
-            user_id=user.id,
+            id=generate_uuid(),
+            user_id=user_id,
             chatbot_id=chatbot_id,
             input_tokens=input_tokens,
             output_tokens=output_tokens,
             total_tokens=total_tokens,
             credits_used=credits_used,
+            credits_used_int=credits_used_int,
             session_id=session_id,
-            query_text=query_text[:500] if query_text else None  # Truncate
+            query_text=query_text[:500] if query_text else None,  # Truncate
+            created_at=now,
+            created_date=now.date()
         )
         
+        if UsageService._flusher is not None:
+            try:
+                with UsageService._pending_lock:
+                    UsageService._pending_credits[user_id] = (
+                        UsageService._pending_credits.get(user_id, Decimal('0')) + credits_used
+                    )
+                UsageService._queue.put_nowait(usage_log)
+                logger.debug(f"Queued usage: {total_tokens} tokens, {credits_used} credits for {mongo_user_id}")
+                return usage_log
+            except queue.Full:
+                UsageService._release_pending([usage_log])
+                logger.warning("Usage log queue full - writing synchronously")
+        
         db.add(usage_log)
+        UsageService._update_daily_totals(db, [usage_log])
         db.commit()
         
         logger.debug(f"Logged usage: {total_tokens} tokens, {credits_used} credits for {mongo_user_id}")
@@ -89,32 +402,96 @@ class UsageService:
         Returns:
             List of usage records
         """
-        user = db.query(User).filter(User.mongo_user_id == mongo_user_id).first()
+        user_id = UsageService.resolve_user_id(db, mongo_user_id)
         
-        if user is None:
+        if user_id is None:
             return []
         
-        query = db.query(UsageLog).filter(UsageLog.user_id == user.id)
+        # Select only the returned columns - plain rows, no ORM objects
+        query = db.query(
+            UsageLog.id,
+            UsageLog.chatbot_id,
+            UsageLog.input_tokens,
+            UsageLog.output_tokens,
+            UsageLog.total_tokens,
+            UsageLog.credits_used,
+            UsageLog.session_id,
+            func.to_char(UsageLog.created_at, ISO_TIMESTAMP_FORMAT).label('created_at_iso')
+        ).filter(UsageLog.user_id == user_id)
         
         if chatbot_id:
             query = query.filter(UsageLog.chatbot_id == chatbot_id)
         
-        logs = query.order_by(desc(UsageLog.created_at)).offset(offset).limit(limit).all()
+        rows = query.order_by(desc(UsageLog.created_at)).offset(offset).limit(limit).all()
         
         return [
             {
-                "id": str(log.id),
-                "chatbot_id": log.chatbot_id,
-                "input_tokens": log.input_tokens,
-                "output_tokens": log.output_tokens,
-                "total_tokens": log.total_tokens,
-                "credits_used": float(log.credits_used),
-                "session_id": log.session_id,
-                "created_at": log.created_at.isoformat() if log.created_at else None
+                "id": str(row.id),
+                "chatbot_id": row.chatbot_id,
+                "input_tokens": row.input_tokens,
+                "output_tokens": row.output_tokens,
+                "total_tokens": row.total_tokens,
+                "credits_used": float(row.credits_used),
+                "session_id": row.session_id,
+                "created_at": row.created_at_iso
             }
-            for log in logs
+            for row in rows
         ]
     
+    @staticmethod
+    def stream_usage_history(
+        db: Session,
+        mongo_user_id: str,
+        chatbot_id: str = None
+    ) -> Iterator[dict]:
+        """
+        Stream a user's full usage history (for exports).
+        Rows are fetched through a server-side cursor in batches of 500,
+        so memory stays bounded regardless of history length.
+        
+        Args:
+            db: Database session (must stay open while iterating)
+            mongo_user_id: User ID from MongoDB auth
+            chatbot_id: Optional filter by chatbot
+            
+        Yields:
+            Usage records in the same shape as get_usage_history
+        """
+        user_id = UsageService.resolve_user_id(db, mongo_user_id)
+        
+        if user_id is None:
+            return
+        
+        query = db.query(
+            UsageLog.id,
+            UsageLog.chatbot_id,
+            UsageLog.input_tokens,
+            UsageLog.output_tokens,
+            UsageLog.total_tokens,
+            UsageLog.credits_used,
+            UsageLog.session_id,
+            func.to_char(UsageLog.created_at, ISO_TIMESTAMP_FORMAT).label('created_at_iso')
+        ).filter(UsageLog.user_id == user_id)
+        
+        if chatbot_id:
+            query = query.filter(UsageLog.chatbot_id == chatbot_id)
+        
+        rows = query.order_by(desc(UsageLog.created_at)).execution_options(
+            stream_results=True
+        ).yield_per(500)
+        
+        for row in rows:
+            yield {
+                "id": str(row.id),
+                "chatbot_id": row.chatbot_id,
+                "input_tokens": row.input_tokens,
+                "output_tokens": row.output_tokens,
+                "total_tokens": row.total_tokens,
+                "credits_used": float(row.credits_used),
+                "session_id": row.session_id,
+                "created_at": row.created_at_iso
+            }
+    
     @staticmethod
     def get_usage_summary(
         db: Session,
@@ -132,9 +509,9 @@ class UsageService:
         Returns:
             Summary dict with totals
         """
-        user = db.query(User).filter(User.mongo_user_id == mongo_user_id).first()
+        user_id = UsageService.resolve_user_id(db, mongo_user_id)
         
-        if user is None:
+        if user_id is None:
             return {
                 "total_queries": 0,
                 "total_tokens": 0,
@@ -142,21 +519,22 @@ class UsageService:
                 "period_days": days
             }
         
-        start_date = datetime.utcnow() - timedelta(days=days)
+        start_date = (datetime.utcnow() - timedelta(days=days)).date()
         
+        # Read the daily rollup - at most one row per day
         result = db.query(
-            func.count(UsageLog.id).label('query_count'),
-            func.sum(UsageLog.total_tokens).label('total_tokens'),
-            func.sum(UsageLog.credits_used).label('total_credits')
+            func.sum(DailyUsageTotal.queries).label('query_count'),
+            func.sum(DailyUsageTotal.tokens).label('total_tokens'),
+            func.sum(DailyUsageTotal.credits_int).label('total_credits')
         ).filter(
-            UsageLog.user_id == user.id,
-            UsageLog.created_at >= start_date
+            DailyUsageTotal.user_id == user_id,
+            DailyUsageTotal.date >= start_date
         ).first()
         
         return {
             "total_queries": result.query_count or 0,
             "total_tokens": result.total_tokens or 0,
-            "total_credits": float(result.total_credits or 0),
+            "total_credits": int(result.total_credits or 0) / CREDIT_SCALE,  # SUM(bigint) is NUMERIC
             "period_days": days
         }
     
@@ -177,26 +555,24 @@ class UsageService:
         Returns:
             List of daily usage records
         """
-        user = db.query(User).filter(User.mongo_user_id == mongo_user_id).first()
+        user_id = UsageService.resolve_user_id(db, mongo_user_id)
         
-        if user is None:
+        if user_id is None:
             return []
         
-        start_date = datetime.utcnow() - timedelta(days=days)
+        start_date = (datetime.utcnow() - timedelta(days=days)).date()
         
-        # SQLAlchemy date truncation
+        # One pre-aggregated row per day
         results = db.query(
-            func.date(UsageLog.created_at).label('date'),
-            func.count(UsageLog.id).label('queries'),
-            func.sum(UsageLog.total_tokens).label('tokens'),
-            func.sum(UsageLog.credits_used).label('credits')
+            DailyUsageTotal.date.label('date'),
+            DailyUsageTotal.queries.label('queries'),
+            DailyUsageTotal.tokens.label('tokens'),
+            DailyUsageTotal.credits_int.label('credits')
         ).filter(
-            UsageLog.user_id == user.id,
-            UsageLog.created_at >= start_date
-        ).group_by(
-            func.date(UsageLog.created_at)
+            DailyUsageTotal.user_id == user_id,
+            DailyUsageTotal.date >= start_date
         ).order_by(
-            func.date(UsageLog.created_at)
+            DailyUsageTotal.date
         ).all()
         
         return [
@@ -204,7 +580,97 @@ class UsageService:
                 "date": str(r.date),
                 "queries": r.queries or 0,
                 "tokens": r.tokens or 0,
-                "credits": float(r.credits or 0)
+                "credits": (r.credits or 0) / CREDIT_SCALE
             }
             for r in results
         ]
+    
+    @staticmethod
+    def get_dashboard_bundle(
+        db: Session,
+        mongo_user_id: str,
+        days: int = 30,
+        limit: int = 50,
+        offset: int = 0,
+        chatbot_id: str = None
+    ) -> Dict:
+        """
+        Get usage summary and a page of usage history in one round trip.
+        Equivalent to get_usage_summary + get_usage_history.
+        
+        Args:
+            db: Database session
+            mongo_user_id: User ID from MongoDB auth
+            days: Number of days for the summary
+            limit: Max history records to return
+            offset: History pagination offset
+            chatbot_id: Optional history filter by chatbot
+            
+        Returns:
+            Dict with "summary" and "usage" keys
+        """
+        summary = {
+            "total_queries": 0,
+            "total_tokens": 0,
+            "total_credits": 0,
+            "period_days": days
+        }
+        
+        user_id = UsageService.resolve_user_id(db, mongo_user_id)
+        
+        if user_id is None:
+            return {"summary": summary, "usage": []}
+        
+        chatbot_filter = "AND chatbot_id = :chatbot_id" if chatbot_id else ""
+        
+        rows = db.execute(
+            text(f"""
+                SELECT 'summary' AS k, NULL AS id, NULL AS chatbot_id,
+                       NULL::integer AS input_tokens, NULL::integer AS output_tokens,
+                       COALESCE(SUM(queries), 0)::bigint AS query_count,
+                       COALESCE(SUM(tokens), 0)::bigint AS total_tokens,
+                       COALESCE(SUM(credits_int), 0) / CAST(:credit_scale AS numeric) AS credits_used,
+                       NULL AS session_id, NULL AS created_at_iso
+                FROM daily_usage_totals
+                WHERE user_id = :user_id AND date >= :start_date
+                UNION ALL
+                (
+                    SELECT 'log', id, chatbot_id, input_tokens, output_tokens,
+                           NULL, total_tokens, credits_used, session_id,
+                           to_char(created_at, :iso_format)
+                    FROM usage_logs
+                    WHERE user_id = :user_id {chatbot_filter}
+                    ORDER BY created_at DESC
+                    LIMIT :limit OFFSET :offset
+                )
+            """),
+            {
+                "user_id": user_id,
+                "start_date": (datetime.utcnow() - timedelta(days=days)).date(),
+                "chatbot_id": chatbot_id,
+                "limit": limit,
+                "offset": offset,
+                "iso_format": ISO_TIMESTAMP_FORMAT,
+                "credit_scale": CREDIT_SCALE
+            }
+        ).all()
+        
+        usage = []
+        for r in rows:
+            if r.k == 'summary':
+                summary["total_queries"] = r.query_count or 0
+                summary["total_tokens"] = r.total_tokens or 0
+                summary["total_credits"] = float(r.credits_used or 0)
+            else:
+                usage.append({
+                    "id": str(r.id),
+                    "chatbot_id": r.chatbot_id,
+                    "input_tokens": r.input_tokens,
+                    "output_tokens": r.output_tokens,
+                    "total_tokens": r.total_tokens,
+                    "credits_used": float(r.credits_used),
+                    "session_id": r.session_id,
+                    "created_at": r.created_at_iso
+                })
+        
+        return {"summary": summary, "usage": usage}
@@ -2,22 +2,344 @@
 MongoDB-based Usage Service
 Tracks token usage and credit consumption
 """
+import atexit
 import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 from decimal import Decimal
 
+from pymongo import UpdateOne, WriteConcern
 from pymongo.database import Database
-from bson import ObjectId, Decimal128
+from pymongo.errors import BulkWriteError
+from bson import ObjectId, json_util
 
-from billing.mongodb import get_mongo_db, decimal_to_decimal128, decimal128_to_decimal
+from billing.mongodb import (
+    get_mongo_db,
+    micro_to_float,
+    to_micro,
+    to_object_id,
+    MICROCREDITS_PER_CREDIT,
+    USAGE_HISTORY_INDEX
+)
+from billing import spill
 
 logger = logging.getLogger(__name__)
 
+# Background flush configuration for usage logs
+FLUSH_INTERVAL_SECONDS = 1.0
+FLUSH_BATCH_SIZE = 500
+MAX_QUEUED_LOGS = 10000
+
+# Usage logs are billing records: every flush waits for the primary's acknowledgement
+FLUSH_WRITE_CONCERN = WriteConcern(w=1)
+
+# A batch whose write fails is retried after FLUSH_RETRY_SECONDS, doubling
+# each time; after FLUSH_MAX_ATTEMPTS it is spilled to disk and replayed on
+# the next start
+FLUSH_RETRY_SECONDS = 1.0
+FLUSH_MAX_ATTEMPTS = 5
+SPILL_PATH = spill.spill_path('mongo_usage_logs')
+
+# Collections a flush writes, in order; a failed batch resumes from the
+# step that failed so rollup increments are never applied twice
+FLUSH_STEPS = ('usage_logs', 'usage_daily', 'agent_daily')
+
+# Duplicate key: the document was inserted by an earlier attempt
+_DUPLICATE_KEY = 11000
+
+# Cursor batch size for bounded history reads
+HISTORY_BATCH_SIZE = 200
+
+# Final history API row shape, built server-side. Every referenced field
+# (and _id) is in the USAGE_HISTORY_INDEX so these reads are index-only.
+_HISTORY_ROW_PROJECTION = {
+    '_id': 0,
+    'id': {'$toString': '$_id'},
+    'chatbot_id': '$agentName',
+    'input_tokens': {'$ifNull': ['$inputTokens', 0]},
+    'output_tokens': {'$ifNull': ['$outputTokens', 0]},
+    'total_tokens': {'$ifNull': ['$totalTokens', 0]},
+    'credits_used': {'$divide': [{'$ifNull': ['$creditsUsedMicro', 0]}, MICROCREDITS_PER_CREDIT]},
+    'session_id': '$sessionId',
+    'created_at': {'$dateToString': {'format': '%Y-%m-%dT%H:%M:%S.%L', 'date': '$createdAt'}}
+}
+
+# Max cached mongo_user_id -> billing_users _id mappings
+BILLING_ID_CACHE_SIZE = 50000
+
 
 class UsageServiceMongo:
     """MongoDB-based usage tracking service"""
     
+    # Pending usage log documents, written in batches by the flusher thread
+    _queue: "queue.Queue[Dict]" = queue.Queue(maxsize=MAX_QUEUED_LOGS)
+    _flush_lock = threading.Lock()
+    _flusher: Optional[threading.Thread] = None
+    # Failed batches awaiting retry: (retry_at, attempts, docs, FLUSH_STEPS done); guarded by _flush_lock
+    _retry: List[Tuple[float, int, List[Dict], int]] = []
+    
+    # mongo_user_id -> billing_users _id (immutable once assigned), LRU-bounded
+    _billing_id_cache: "OrderedDict[str, ObjectId]" = OrderedDict()
+    _billing_id_cache_lock = threading.Lock()
+    
+    @staticmethod
+    def _resolve_billing_id(db: Database, mongo_user_id: str) -> Optional[ObjectId]:
+        """
+        Resolve a MongoDB auth user ID to its billing_users _id.
+        Results are cached; billing_users is only queried on a miss.
+        """
+        key = str(mongo_user_id)
+        with UsageServiceMongo._billing_id_cache_lock:
+            billing_id = UsageServiceMongo._billing_id_cache.get(key)
+            if billing_id is not None:
+                UsageServiceMongo._billing_id_cache.move_to_end(key)
+                return billing_id
+        
+        user = db.billing_users.find_one(
+            {'mongoUserId': to_object_id(mongo_user_id)},
+            {'_id': 1}
+        )
+        if not user:
+            return None
+        
+        billing_id = user['_id']
+        with UsageServiceMongo._billing_id_cache_lock:
+            UsageServiceMongo._billing_id_cache[key] = billing_id
+            if len(UsageServiceMongo._billing_id_cache) > BILLING_ID_CACHE_SIZE:
+                UsageServiceMongo._billing_id_cache.popitem(last=False)
+        
+        return billing_id
+    
+    @staticmethod
+    def invalidate_billing_id(mongo_user_id: str) -> None:
+        """Drop a cached billing _id mapping (call when a billing user is deleted)"""
+        with UsageServiceMongo._billing_id_cache_lock:
+            UsageServiceMongo._billing_id_cache.pop(str(mongo_user_id), None)
+    
+    @staticmethod
+    def start_flusher() -> None:
+        """
+        Start the background thread that batches queued usage logs.
+        Safe to call multiple times - only one flusher is started.
+        """
+        if UsageServiceMongo._flusher is not None and UsageServiceMongo._flusher.is_alive():
+            return
+        
+        UsageServiceMongo._replay_spill()
+        
+        UsageServiceMongo._flusher = threading.Thread(
+            target=UsageServiceMongo._flush_loop,
+            name="mongo-usage-log-flusher",
+            daemon=True
+        )
+        UsageServiceMongo._flusher.start()
+        atexit.register(UsageServiceMongo._flush_at_exit)
+        logger.info("MongoDB usage log flusher started")
+    
+    @staticmethod
+    def _flush_loop() -> None:
+        """Drain the queue every FLUSH_INTERVAL_SECONDS or FLUSH_BATCH_SIZE docs, retrying failed batches"""
+        while True:
+            try:
+                first = UsageServiceMongo._queue.get(timeout=UsageServiceMongo._next_retry_in())
+            except queue.Empty:
+                first = None
+            
+            with UsageServiceMongo._flush_lock:
+                UsageServiceMongo._retry_due()
+                if first is None:
+                    continue
+                
+                batch = [first]
+                deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+                
+                while len(batch) < FLUSH_BATCH_SIZE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(UsageServiceMongo._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                
+                UsageServiceMongo._write_batch(batch)
+    
+    @staticmethod
+    def _next_retry_in() -> Optional[float]:
+        """Seconds until the earliest failed batch is due (None if there are none)"""
+        with UsageServiceMongo._flush_lock:
+            if not UsageServiceMongo._retry:
+                return None
+            return max(0.0, min(entry[0] for entry in UsageServiceMongo._retry) - time.monotonic())
+    
+    @staticmethod
+    def _retry_due() -> None:
+        """Re-write failed batches whose retry time has come (caller holds _flush_lock)"""
+        now = time.monotonic()
+        due = [entry for entry in UsageServiceMongo._retry if entry[0] <= now]
+        UsageServiceMongo._retry = [entry for entry in UsageServiceMongo._retry if entry[0] > now]
+        for _, attempts, docs, step in due:
+            UsageServiceMongo._write_batch(docs, attempts, step)
+    
+    @staticmethod
+    def _insert_logs(db: Database, docs: List[Dict]) -> None:
+        """
+        insert_many that tolerates documents already written by an earlier
+        attempt (docs keep the _id assigned on the first try); raises on any
+        other write error
+        """
+        try:
+            db.usage_logs.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = [err for err in e.details.get('writeErrors', []) if err.get('code') != _DUPLICATE_KEY]
+            if errors or e.details.get('writeConcernErrors'):
+                raise
+    
+    @staticmethod
+    def _write_step(db: Database, step: int, docs: List[Dict]) -> None:
+        """Apply one FLUSH_STEPS write for a batch"""
+        if FLUSH_STEPS[step] == 'usage_logs':
+            UsageServiceMongo._insert_logs(db, docs)
+        else:
+            UsageServiceMongo._update_daily_totals(db, docs, (FLUSH_STEPS[step],))
+    
+    @staticmethod
+    def _write_batch(docs: List[Dict], attempts: int = 0, step: int = 0) -> bool:
+        """
+        Insert a batch of usage log documents with a single insert_many, then
+        add them to the daily rollups. A failed batch is queued for retry from
+        the step that failed, and spilled to disk once it has failed
+        FLUSH_MAX_ATTEMPTS times (caller holds _flush_lock).
+        
+        Args:
+            docs: Usage log documents
+            attempts: Failed attempts so far
+            step: FLUSH_STEPS already completed by earlier attempts
+        
+        Returns:
+            True if the batch was written (or spilled)
+        """
+        if not docs:
+            return True
+        
+        try:
+            db = get_mongo_db().with_options(write_concern=FLUSH_WRITE_CONCERN)
+            while step < len(FLUSH_STEPS):
+                UsageServiceMongo._write_step(db, step, docs)
+                step += 1
+            logger.debug(f"Flushed {len(docs)} usage logs")
+            return True
+        except Exception as e:
+            attempts += 1
+            if attempts < FLUSH_MAX_ATTEMPTS:
+                logger.error(f"Failed to flush {len(docs)} usage logs (attempt {attempts}), will retry: {e}")
+                delay = FLUSH_RETRY_SECONDS * 2 ** (attempts - 1)
+                UsageServiceMongo._retry.append((time.monotonic() + delay, attempts, docs, step))
+                return False
+            
+            if not spill.append(SPILL_PATH, UsageServiceMongo._to_spill(docs, step)):
+                logger.error(f"Failed to flush or spill {len(docs)} usage logs, will retry: {e}")
+                delay = FLUSH_RETRY_SECONDS * 2 ** attempts
+                UsageServiceMongo._retry.append((time.monotonic() + delay, attempts, docs, step))
+                return False
+            logger.error(f"Failed to flush {len(docs)} usage logs after {attempts} attempts, spilled to {SPILL_PATH}: {e}")
+            return True
+    
+    @staticmethod
+    def _to_spill(docs: List[Dict], step: int) -> List[str]:
+        """Spill file lines for a batch (Extended JSON keeps ObjectIds and dates)"""
+        return [json_util.dumps({'doc': doc, 'step': step}) for doc in docs]
+    
+    @staticmethod
+    def _replay_spill() -> None:
+        """
+        Write usage logs spilled by an earlier run, each resuming from its
+        recorded step. On failure the records go back to the spill file with
+        the steps that did complete.
+        """
+        claimed = spill.claim(SPILL_PATH)
+        if claimed is None:
+            return
+        
+        records = [json_util.loads(line) for line in spill.read(claimed)]
+        step = 0
+        try:
+            db = get_mongo_db().with_options(write_concern=FLUSH_WRITE_CONCERN)
+            for step in range(len(FLUSH_STEPS)):
+                docs = [record['doc'] for record in records if record['step'] <= step]
+                if docs:
+                    UsageServiceMongo._write_step(db, step, docs)
+            logger.info(f"Replayed {len(records)} spilled usage logs")
+            spill.release(claimed, SPILL_PATH, replayed=True)
+        except Exception as e:
+            logger.error(f"Failed to replay {len(records)} spilled usage logs: {e}")
+            lines = [json_util.dumps({'doc': r['doc'], 'step': max(r['step'], step)}) for r in records]
+            spill.release(claimed, SPILL_PATH, replayed=spill.append(SPILL_PATH, lines))
+    
+    @staticmethod
+    def _update_daily_totals(db: Database, docs: List[Dict],
+                             collections: tuple = ('usage_daily', 'agent_daily')) -> None:
+        """Add usage logs to the usage_daily / agent_daily rollups (one bulk_write each)"""
+        user_totals: Dict[tuple, List[int]] = {}
+        agent_totals: Dict[tuple, List[int]] = {}
+        for doc in docs:
+            created = doc['createdAt']
+            day = datetime(created.year, created.month, created.day)
+            for totals, key in ((user_totals, (doc['userId'], day)), (agent_totals, (doc['agentName'], day))):
+                t = totals.setdefault(key, [0, 0, 0])
+                t[0] += 1
+                t[1] += doc['totalTokens']
+                t[2] += doc['creditsUsedMicro']
+        
+        for collection, field, totals in (
+            (db.usage_daily, 'userId', user_totals),
+            (db.agent_daily, 'agentName', agent_totals)
+        ):
+            if collection.name not in collections or not totals:
+                continue
+            collection.bulk_write([
+                UpdateOne(
+                    {field: key, 'date': day},
+                    {'$inc': {'queries': queries, 'tokens': tokens, 'creditsMicro': credits_micro}},
+                    upsert=True
+                )
+                for (key, day), (queries, tokens, credits_micro) in totals.items()
+            ], ordered=False)
+    
+    @staticmethod
+    def flush_now() -> None:
+        """
+        Synchronously write all queued usage logs and pending retries.
+        Call before reads that need up-to-date usage logs.
+        """
+        with UsageServiceMongo._flush_lock:
+            docs = []
+            while True:
+                try:
+                    docs.append(UsageServiceMongo._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            retry = UsageServiceMongo._retry
+            UsageServiceMongo._retry = []
+            for _, attempts, failed, step in retry:
+                UsageServiceMongo._write_batch(failed, attempts, step)
+            UsageServiceMongo._write_batch(docs)
+    
+    @staticmethod
+    def _flush_at_exit() -> None:
+        """Final flush; batches that still fail are spilled instead of being dropped with the process"""
+        UsageServiceMongo.flush_now()
+        with UsageServiceMongo._flush_lock:
+            retry = UsageServiceMongo._retry
+            UsageServiceMongo._retry = []
+            for _, _, docs, step in retry:
+                UsageServiceMongo._write_batch(docs, FLUSH_MAX_ATTEMPTS - 1, step)
+    
     @staticmethod
     def log_usage(db: Database, mongo_user_id: str, agent_name: str, 
                   input_tokens: int, output_tokens: int, 
@@ -33,14 +355,13 @@ class UsageServiceMongo:
             output_tokens: Output/completion tokens
             session_id: Optional session ID
             query_text: Optional query text (truncated)
+        
+        When the flusher is running the log is queued and written in the
+        next batch; otherwise it is inserted immediately.
         """
-        # Get billing user ID
-        user = db.billing_users.find_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'_id': 1}
-        )
+        billing_id = UsageServiceMongo._resolve_billing_id(db, mongo_user_id)
         
-        if not user:
+        if billing_id is None:
             logger.warning(f"Billing user not found for {mongo_user_id}")
             return
         
@@ -48,24 +369,34 @@ class UsageServiceMongo:
         from billing.settings_service_mongo import SettingsServiceMongo
         tokens_per_credit = SettingsServiceMongo.get_tokens_per_credit(db)
         total_tokens = input_tokens + output_tokens
-        credits_used = Decimal(str(total_tokens)) / Decimal(str(tokens_per_credit))
+        # Same conversion as the wallet deduction, so logs and rollups match it exactly
+        credits_used_micro = to_micro(Decimal(total_tokens) / tokens_per_credit)
         
         # Create usage log
         usage_log = {
-            'userId': user['_id'],
+            'userId': billing_id,
             'agentId': None,  # Can be populated if agent stored in MongoDB
             'agentName': agent_name,
             'inputTokens': input_tokens,
             'outputTokens': output_tokens,
             'totalTokens': total_tokens,
-            'creditsUsed': decimal_to_decimal128(credits_used),
+            'creditsUsedMicro': credits_used_micro,
             'sessionId': session_id,
             'queryText': query_text[:100] if query_text else None,  # Truncate
             'createdAt': datetime.utcnow()
         }
         
+        if UsageServiceMongo._flusher is not None:
+            try:
+                UsageServiceMongo._queue.put_nowait(usage_log)
+                logger.debug(f"Queued usage: {total_tokens} tokens, {micro_to_float(credits_used_micro):.4f} credits for {mongo_user_id}")
+                return
+            except queue.Full:
+                logger.warning("Usage log queue full, writing synchronously")
+        
         db.usage_logs.insert_one(usage_log)
-        logger.debug(f"Logged usage: {total_tokens} tokens, {credits_used:.4f} credits for {mongo_user_id}")
+        UsageServiceMongo._update_daily_totals(db, [usage_log])
+        logger.debug(f"Logged usage: {total_tokens} tokens, {micro_to_float(credits_used_micro):.4f} credits for {mongo_user_id}")
     
     @staticmethod
     def get_user_usage(db: Database, mongo_user_id: str, days: int = 30, limit: int = 100) -> List[Dict]:
@@ -81,32 +412,40 @@ class UsageServiceMongo:
         Returns:
             List of usage log dicts
         """
-        user = db.billing_users.find_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'_id': 1}
-        )
+        billing_id = UsageServiceMongo._resolve_billing_id(db, mongo_user_id)
         
-        if not user:
+        if billing_id is None:
             return []
         
         cutoff = datetime.utcnow() - timedelta(days=days)
         
-        logs = list(db.usage_logs.find(
+        cursor = db.usage_logs.find(
             {
-                'userId': user['_id'],
+                'userId': billing_id,
                 'createdAt': {'$gte': cutoff}
             },
             {'queryText': 0}  # Exclude query text
-        ).sort('createdAt', -1).limit(limit))
+        ).sort('createdAt', -1).limit(limit).batch_size(min(limit, HISTORY_BATCH_SIZE)).hint(
+            [('userId', 1), ('createdAt', -1)]
+        )
         
-        # Convert Decimal128 to float for JSON
-        for log in logs:
-            log['creditsUsed'] = float(log['creditsUsed'].to_decimal()) if log.get('creditsUsed') else 0
+        # Convert micro-credits to float for JSON
+        logs = []
+        for log in cursor:
+            log['creditsUsed'] = UsageServiceMongo._credits_used(log)
+            log.pop('creditsUsedMicro', None)
             log['_id'] = str(log['_id'])
             log['userId'] = str(log['userId'])
+            logs.append(log)
         
         return logs
     
+    @staticmethod
+    def _window_start(days: int) -> datetime:
+        """First rollup day (UTC midnight) of a days-long reporting window"""
+        start = datetime.utcnow() - timedelta(days=days)
+        return datetime(start.year, start.month, start.day)
+    
     @staticmethod
     def get_usage_stats(db: Database, mongo_user_id: str, days: int = 30) -> Dict:
         """
@@ -120,55 +459,39 @@ class UsageServiceMongo:
         Returns:
             Stats dict
         """
-        user = db.billing_users.find_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'_id': 1}
-        )
+        billing_id = UsageServiceMongo._resolve_billing_id(db, mongo_user_id)
         
-        if not user:
-            return {
-                'total_queries': 0,
-                'total_tokens': 0,
-                'total_credits_used': 0.0,
-                'average_tokens_per_query': 0
-            }
-        
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        
-        pipeline = [
-            {
-                '$match': {
-                    'userId': user['_id'],
-                    'createdAt': {'$gte': cutoff}
-                }
-            },
-            {
-                '$group': {
-                    '_id': None,
-                    'totalQueries': {'$sum': 1},
-                    'totalTokens': {'$sum': '$totalTokens'},
-                    'totalCreditsUsed': {'$sum': '$creditsUsed'},
-                    'avgTokens': {'$avg': '$totalTokens'}
+        stats = {}
+        if billing_id is not None:
+            start_date = UsageServiceMongo._window_start(days)
+            
+            pipeline = [
+                {
+                    '$match': {
+                        'userId': billing_id,
+                        'date': {'$gte': start_date}
+                    }
+                },
+                {
+                    '$group': {
+                        '_id': None,
+                        'totalQueries': {'$sum': '$queries'},
+                        'totalTokens': {'$sum': '$tokens'},
+                        'totalCreditsUsed': {'$sum': '$creditsMicro'}
+                    }
                 }
-            }
-        ]
-        
-        result = list(db.usage_logs.aggregate(pipeline))
-        
-        if not result:
-            return {
-                'total_queries': 0,
-                'total_tokens': 0,
-                'total_credits_used': 0.0,
-                'average_tokens_per_query': 0
-            }
+            ]
+            
+            # At most one group; no usage (or no user) falls through to zero defaults
+            stats = next(db.usage_daily.aggregate(pipeline), {})
         
-        stats = result[0]
+        total_queries = stats.get('totalQueries', 0)
+        total_tokens = stats.get('totalTokens', 0)
         return {
-            'total_queries': stats.get('totalQueries', 0),
-            'total_tokens': stats.get('totalTokens', 0),
-            'total_credits_used': float(stats.get('totalCreditsUsed', Decimal128("0")).to_decimal()),
-            'average_tokens_per_query': int(stats.get('avgTokens', 0))
+            'total_queries': total_queries,
+            'total_tokens': total_tokens,
+            'total_credits_used': micro_to_float(stats.get('totalCreditsUsed')),
+            'average_tokens_per_query': total_tokens // total_queries if total_queries else 0
         }
     
     @staticmethod
@@ -184,22 +507,20 @@ class UsageServiceMongo:
         Returns:
             List of {agent_name, query_count, total_tokens}
         """
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        
         pipeline = [
-            {'$match': {'createdAt': {'$gte': cutoff}}},
+            {'$match': {'date': {'$gte': UsageServiceMongo._window_start(days)}}},
             {
                 '$group': {
                     '_id': '$agentName',
-                    'queryCount': {'$sum': 1},
-                    'totalTokens': {'$sum': '$totalTokens'}
+                    'queryCount': {'$sum': '$queries'},
+                    'totalTokens': {'$sum': '$tokens'}
                 }
             },
             {'$sort': {'queryCount': -1}},
             {'$limit': limit}
         ]
         
-        results = list(db.usage_logs.aggregate(pipeline))
+        results = list(db.agent_daily.aggregate(pipeline))
         
         return [
             {
@@ -223,36 +544,34 @@ class UsageServiceMongo:
         Returns:
             List of {user_id, email, query_count, total_tokens}
         """
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        
         pipeline = [
-            {'$match': {'createdAt': {'$gte': cutoff}}},
+            {'$match': {'date': {'$gte': UsageServiceMongo._window_start(days)}}},
             {
                 '$group': {
                     '_id': '$userId',
-                    'queryCount': {'$sum': 1},
-                    'totalTokens': {'$sum': '$totalTokens'}
+                    'queryCount': {'$sum': '$queries'},
+                    'totalTokens': {'$sum': '$tokens'}
                 }
             },
             {'$sort': {'totalTokens': -1}},
-            {'$limit': limit},
-            {
-                '$lookup': {
-                    'from': 'billing_users',
-                    'localField': '_id',
-                    'foreignField': '_id',
-                    'as': 'user'
-                }
-            },
-            {'$unwind': {'path': '$user', 'preserveNullAndEmptyArrays': True}}
+            {'$limit': limit}
         ]
         
-        results = list(db.usage_logs.aggregate(pipeline))
+        results = list(db.usage_daily.aggregate(pipeline))
+        
+        # Decorate only the top-N rows with emails (single _id lookup)
+        emails = {
+            u['_id']: u.get('email')
+            for u in db.billing_users.find(
+                {'_id': {'$in': [r['_id'] for r in results]}},
+                {'email': 1}
+            )
+        } if results else {}
         
         return [
             {
                 'user_id': str(r['_id']),
-                'email': r.get('user', {}).get('email', 'Unknown'),
+                'email': emails.get(r['_id']) or 'Unknown',
                 'query_count': r['queryCount'],
                 'total_tokens': r['totalTokens']
             }
@@ -273,44 +592,64 @@ class UsageServiceMongo:
         Returns:
             List of usage log dicts
         """
-        user = db.billing_users.find_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'_id': 1}
-        )
+        billing_id = UsageServiceMongo._resolve_billing_id(db, mongo_user_id)
         
-        if not user:
+        if billing_id is None:
             return []
         
-        query = {'userId': user['_id']}
+        query = {'userId': billing_id}
         if chatbot_id:
             query['agentName'] = chatbot_id
         
-        logs = list(db.usage_logs.find(
-            query,
-            {'queryText': 0}  # Exclude query text
-        ).sort('createdAt', -1).limit(limit))
-        
-        # Convert for JSON response
-        result = []
-        for log in logs:
-            credits_used = log.get('creditsUsed')
-            if hasattr(credits_used, 'to_decimal'):
-                credits_used = float(credits_used.to_decimal())
-            else:
-                credits_used = float(credits_used or 0)
+        return list(db.usage_logs.aggregate(
+            UsageServiceMongo._history_pipeline(query, limit),
+            hint=USAGE_HISTORY_INDEX,
+            batchSize=min(limit, HISTORY_BATCH_SIZE)
+        ))
+    
+    @staticmethod
+    def stream_usage_history(db: Database, mongo_user_id: str, chatbot_id: str = None) -> Iterator[Dict]:
+        """
+        Stream a user's full usage history (for exports)
+        
+        Args:
+            db: MongoDB database
+            mongo_user_id: User ID
+            chatbot_id: Optional filter by chatbot/agent
             
-            result.append({
-                'id': str(log['_id']),
-                'chatbot_id': log.get('agentName'),
-                'input_tokens': log.get('inputTokens', 0),
-                'output_tokens': log.get('outputTokens', 0),
-                'total_tokens': log.get('totalTokens', 0),
-                'credits_used': credits_used,
-                'session_id': log.get('sessionId'),
-                'created_at': log.get('createdAt').isoformat() if log.get('createdAt') else None
-            })
-        
-        return result
+        Yields:
+            Usage log dicts in the same shape as get_usage_history
+        """
+        billing_id = UsageServiceMongo._resolve_billing_id(db, mongo_user_id)
+        
+        if billing_id is None:
+            return
+        
+        query = {'userId': billing_id}
+        if chatbot_id:
+            query['agentName'] = chatbot_id
+        
+        yield from db.usage_logs.aggregate(
+            UsageServiceMongo._history_pipeline(query),
+            hint=USAGE_HISTORY_INDEX,
+            batchSize=500
+        )
+    
+    @staticmethod
+    def _credits_used(log: Dict) -> float:
+        """Credits used by a log as float (same rule as _HISTORY_ROW_PROJECTION)"""
+        return micro_to_float(log.get('creditsUsedMicro', 0))
+    
+    @staticmethod
+    def _history_pipeline(query: Dict, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Aggregation returning usage logs matching query, newest first, in the history API shape"""
+        pipeline = [{'$match': query}, {'$sort': {'createdAt': -1}}]
+        if offset:
+            pipeline.append({'$skip': offset})
+        if limit is not None:
+            pipeline.append({'$limit': limit})
+        pipeline.append({'$project': _HISTORY_ROW_PROJECTION})
+        return pipeline
     
     @staticmethod
     def get_usage_summary(db: Database, mongo_user_id: str, days: int = 30) -> Dict:
@@ -320,4 +659,38 @@ class UsageServiceMongo:
         """
         stats = UsageServiceMongo.get_usage_stats(db, mongo_user_id, days)
         return stats
+    
+    @staticmethod
+    def get_dashboard_bundle(
+        db: Database,
+        mongo_user_id: str,
+        days: int = 30,
+        limit: int = 50,
+        offset: int = 0,
+        chatbot_id: str = None
+    ) -> Dict:
+        """
+        Get usage summary and a page of usage history - API compatible method.
+        The summary comes from usage_daily and the page from usage_logs, so this
+        is two reads (the PostgreSQL service does it in one).
+        
+        Returns:
+            Dict with "summary" and "usage" keys
+        """
+        summary = UsageServiceMongo.get_usage_summary(db, mongo_user_id, days)
+        billing_id = UsageServiceMongo._resolve_billing_id(db, mongo_user_id)
+        
+        if billing_id is None:
+            return {"summary": summary, "usage": []}
+        
+        query = {'userId': billing_id}
+        if chatbot_id:
+            query['agentName'] = chatbot_id
+        
+        usage = list(db.usage_logs.aggregate(
+            UsageServiceMongo._history_pipeline(query, limit, offset),
+            hint=USAGE_HISTORY_INDEX,
+            batchSize=min(limit, HISTORY_BATCH_SIZE)
+        ))
+        return {"summary": summary, "usage": usage}
 
@@ -3,17 +3,33 @@ Wallet Service - Credit management with atomic operations
 Handles balance checks, deductions, and additions
 """
 import logging
+import time
 from decimal import Decimal
 from datetime import datetime, timedelta
 from typing import Optional, Tuple
-from sqlalchemy import func
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
-from billing.models import User, Wallet, UsageLog
+from billing.models import User, Wallet, DailyUsageTotal
 from billing.database import get_db_session
+from billing.usage_service import UsageService
+from billing.settings_service import SettingsService, decode_setting_value
 
 logger = logging.getLogger(__name__)
 
+# (days since epoch, UTC midnight) - rebuilt only when the day rolls over
+_today: Tuple[int, datetime] = (-1, datetime.min)
+
+
+def _today_start() -> datetime:
+    """Start of the current UTC day, cached until midnight"""
+    global _today
+    day = int(time.time() // 86400)
+    if _today[0] != day:
+        _today = (day, datetime(1970, 1, 1) + timedelta(days=day))
+    return _today[1]
+
 
 class WalletService:
     """Service for managing user credit wallets"""
@@ -34,20 +50,24 @@ class WalletService:
         user = db.query(User).filter(User.mongo_user_id == mongo_user_id).first()
         
         if user is None:
-            # Create new user with wallet
-            user = User(
+            # Create new user; a concurrent request may have won the race
+            stmt = pg_insert(User).values(
                 mongo_user_id=mongo_user_id,
                 email=email or f"{mongo_user_id}@placeholder.local"
-            )
-            db.add(user)
-            db.flush()  # Get the user ID
+            ).on_conflict_do_nothing(index_elements=['mongo_user_id']).returning(User)
+            user = db.scalars(stmt).first()
             
-            # Create wallet for new user
-            wallet = Wallet(user_id=user.id, credits_remaining=Decimal('0'))
-            db.add(wallet)
-            db.commit()
+            if user is None:
+                user = db.query(User).filter(User.mongo_user_id == mongo_user_id).first()
+            else:
+                # Create wallet for new user
+                db.execute(
+                    pg_insert(Wallet).values(user_id=user.id, credits_remaining=Decimal('0'))
+                    .on_conflict_do_nothing(index_elements=['user_id'])
+                )
+                logger.info(f"Created new billing user and wallet for {mongo_user_id}")
             
-            logger.info(f"Created new billing user and wallet for {mongo_user_id}")
+            db.commit()
         
         return user
     
@@ -63,12 +83,13 @@ class WalletService:
         Returns:
             Credit balance as Decimal
         """
-        user = db.query(User).filter(User.mongo_user_id == mongo_user_id).first()
+        user_id = UsageService.resolve_user_id(db, mongo_user_id)
         
-        if user is None or user.wallet is None:
+        if user_id is None:
             return Decimal('0')
         
-        return user.wallet.credits_remaining
+        balance = db.query(Wallet.credits_remaining).filter(Wallet.user_id == user_id).scalar()
+        return balance if balance is not None else Decimal('0')
     
     @staticmethod
     def get_daily_usage(db: Session, mongo_user_id: str) -> Decimal:
@@ -82,24 +103,32 @@ class WalletService:
         Returns:
             Today's usage as Decimal
         """
-        user = db.query(User).filter(User.mongo_user_id == mongo_user_id).first()
+        user_id = UsageService.resolve_user_id(db, mongo_user_id)
         
-        if user is None:
+        if user_id is None:
             return Decimal('0')
         
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        result = db.query(func.sum(UsageLog.credits_used)).filter(
-            UsageLog.user_id == user.id,
-            UsageLog.created_at >= today_start
+        # Same source as the cap checks: today's rollup row
+        result = db.query(DailyUsageTotal.credits).filter(
+            DailyUsageTotal.user_id == user_id,
+            DailyUsageTotal.date == _today_start().date()
         ).scalar()
         
-        return result or Decimal('0')
+        # Count usage logs still queued for writing
+        return (result or Decimal('0')) + UsageService.pending_credits(user_id)
+    
+    @staticmethod
+    def _pending_usage(db: Session, mongo_user_id: str) -> Decimal:
+        """Credits of this user's usage logs still queued for writing in this process"""
+        user_id = UsageService.resolve_user_id(db, mongo_user_id)
+        return UsageService.pending_credits(user_id) if user_id is not None else Decimal('0')
     
     @staticmethod
     def has_sufficient_credits(db: Session, mongo_user_id: str, required: Decimal) -> Tuple[bool, str]:
         """
         Check if user has sufficient credits (including daily cap check).
+        Used as a pre-flight check before running a query with an estimated
+        cost; deduct_credits() enforces the same limits atomically.
         
         Args:
             db: Database session
@@ -109,22 +138,30 @@ class WalletService:
         Returns:
             Tuple of (has_credits, reason_if_not)
         """
-        user = db.query(User).filter(User.mongo_user_id == mongo_user_id).first()
-        
-        if user is None or user.wallet is None:
+        # Balance, today's usage and the daily cap in one round trip
+        row = db.execute(text("""
+            SELECT w.credits_remaining AS balance,
+                   COALESCE((
+                       SELECT d.credits FROM daily_usage_totals d
+                       WHERE d.user_id = u.id AND d.date = :today
+                   ), 0) AS daily_usage,
+                   (SELECT s.value FROM billing_settings s WHERE s.key = 'daily_credit_cap') AS daily_cap
+            FROM billing_users u
+            LEFT JOIN wallets w ON w.user_id = u.id
+            WHERE u.mongo_user_id = :mongo_user_id
+        """), {"mongo_user_id": mongo_user_id, "today": _today_start().date()}).first()
+        
+        if row is None or row.balance is None:
             return False, "No billing account found. Please add credits."
         
-        # Force refresh to get latest balance from database (bypass any caching)
-        db.refresh(user.wallet)
-        balance = user.wallet.credits_remaining
+        balance = row.balance
         
         if balance < required:
             return False, f"Insufficient credits. Balance: {float(balance):.4f}, Required: {float(required):.4f}"
         
         # Check daily cap using admin-configurable setting
-        from billing.settings_service import SettingsService
-        daily_usage = WalletService.get_daily_usage(db, mongo_user_id)
-        daily_cap = Decimal(str(SettingsService.get_daily_credit_cap(db)))
+        daily_usage = row.daily_usage + WalletService._pending_usage(db, mongo_user_id)
+        daily_cap = Decimal(str(decode_setting_value('daily_credit_cap', row.daily_cap)))
         if daily_usage + required > daily_cap:
             remaining_today = daily_cap - daily_usage
             return False, f"Daily limit reached. Remaining today: {remaining_today:.2f} credits"
@@ -135,7 +172,8 @@ class WalletService:
     def deduct_credits(db: Session, mongo_user_id: str, amount: Decimal) -> Tuple[bool, str]:
         """
         Atomically deduct credits from user wallet.
-        Uses database-level check to prevent negative balance.
+        Balance and daily cap are checked in the same UPDATE, so callers
+        don't need a separate has_sufficient_credits() call to be safe.
         
         Args:
             db: Database session
@@ -148,37 +186,63 @@ class WalletService:
         if amount <= 0:
             return True, "No deduction needed"
         
-        user = db.query(User).filter(User.mongo_user_id == mongo_user_id).first()
-        
-        if user is None:
-            # Auto-create user and wallet if they don't exist
-            # This handles cases where user registered but billing account wasn't created
-            logger.warning(f"User {mongo_user_id} not in billing DB, creating billing account")
-            user = WalletService.get_or_create_user(db, mongo_user_id)
-        
-        if user.wallet is None:
-            # Create wallet if missing (defensive)
-            wallet = Wallet(user_id=user.id, credits_remaining=Decimal('0'))
-            db.add(wallet)
-            db.flush()
-            return False, "Insufficient credits. Balance: 0.0000, Required: " + f"{float(amount):.4f}"
-        
-        # Atomic update with balance check
-        result = db.query(Wallet).filter(
-            Wallet.user_id == user.id,
-            Wallet.credits_remaining >= amount  # Prevent negative balance
-        ).update(
-            {Wallet.credits_remaining: Wallet.credits_remaining - amount},
-            synchronize_session=False
-        )
-        
-        if result == 0:
-            # Refresh to get current balance for error message
-            db.expire(user.wallet)
-            current_balance = db.query(Wallet).filter(Wallet.user_id == user.id).first().credits_remaining
-            logger.warning(f"Insufficient credits for {mongo_user_id}: has {current_balance}, needs {amount}")
-            # Return failure - caller's context manager will handle rollback
-            return False, f"Insufficient credits. Balance: {float(current_balance):.4f}, Required: {float(amount):.4f}"
+        daily_cap = Decimal(str(SettingsService.get_daily_credit_cap(db)))
+        now = datetime.utcnow()  # updated_at only; the cap day comes from _today_start()
+        # Queued usage logs count against the daily cap without flushing the queue
+        pending = WalletService._pending_usage(db, mongo_user_id)
+        params = {"mongo_user_id": mongo_user_id, "amount": amount, "today": _today_start().date()}
+        
+        # Atomic update with balance and daily cap check (no prior SELECT)
+        result = db.execute(text("""
+            UPDATE wallets w
+            SET credits_remaining = w.credits_remaining - :amount, updated_at = :now
+            FROM billing_users u
+            WHERE w.user_id = u.id
+              AND u.mongo_user_id = :mongo_user_id
+              AND w.credits_remaining >= :amount
+              AND :amount + :pending + COALESCE((
+                  SELECT d.credits FROM daily_usage_totals d
+                  WHERE d.user_id = u.id AND d.date = :today
+              ), 0) <= :daily_cap
+        """), {**params, "now": now, "daily_cap": daily_cap, "pending": pending})
+        
+        if result.rowcount == 0:
+            # Single targeted read to explain the failure
+            row = db.execute(text("""
+                SELECT u.id AS user_id, w.credits_remaining AS balance,
+                       COALESCE((
+                           SELECT d.credits FROM daily_usage_totals d
+                           WHERE d.user_id = u.id AND d.date = :today
+                       ), 0) AS daily_usage
+                FROM billing_users u
+                LEFT JOIN wallets w ON w.user_id = u.id
+                WHERE u.mongo_user_id = :mongo_user_id
+            """), params).first()
+            
+            if row is None:
+                # Auto-create user and wallet if they don't exist
+                # This handles cases where user registered but billing account wasn't created
+                logger.warning(f"User {mongo_user_id} not in billing DB, creating billing account")
+                WalletService.get_or_create_user(db, mongo_user_id)
+                return False, "Insufficient credits. Balance: 0.0000, Required: " + f"{float(amount):.4f}"
+            
+            if row.balance is None:
+                # Create wallet if missing (defensive)
+                db.execute(
+                    pg_insert(Wallet).values(user_id=row.user_id, credits_remaining=Decimal('0'))
+                    .on_conflict_do_nothing(index_elements=['user_id'])
+                )
+                return False, "Insufficient credits. Balance: 0.0000, Required: " + f"{float(amount):.4f}"
+            
+            if row.balance < amount:
+                logger.warning(f"Insufficient credits for {mongo_user_id}: has {row.balance}, needs {amount}")
+                # Return failure - caller's context manager will handle rollback
+                return False, f"Insufficient credits. Balance: {float(row.balance):.4f}, Required: {float(amount):.4f}"
+            
+            daily_usage = row.daily_usage + pending
+            remaining_today = daily_cap - daily_usage
+            logger.warning(f"Daily cap reached for {mongo_user_id}: used {daily_usage}, needs {amount}")
+            return False, f"Daily limit reached. Remaining today: {remaining_today:.2f} credits"
         
         # Don't commit here - let the caller's context manager handle commit
         logger.info(f"Deducted {amount} credits from user {mongo_user_id}")
@@ -238,7 +302,6 @@ class WalletService:
         daily_usage = WalletService.get_daily_usage(db, mongo_user_id)
         
         # Get daily cap from settings
-        from billing.settings_service import SettingsService
         daily_credit_cap = SettingsService.get_daily_credit_cap(db)
         
         return {
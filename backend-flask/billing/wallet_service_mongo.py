@@ -3,26 +3,63 @@ MongoDB-based Wallet Service
 Replaces SQLAlchemy version with native PyMongo
 """
 import logging
+import time
 from decimal import Decimal
 from datetime import datetime, timedelta
 from typing import Optional, Tuple, Dict
 
 from pymongo.database import Database
 from pymongo import ReturnDocument
-from bson import ObjectId, Decimal128
+from bson.int64 import Int64
 
 from billing.mongodb import (
     get_mongo_db, 
     get_billing_users, 
     get_usage_logs,
-    decimal_to_decimal128,
-    decimal128_to_decimal,
-    decimal128_to_float,
+    to_micro,
+    from_micro,
+    micro_to_float,
+    MICROCREDITS_PER_CREDIT,
+    to_object_id,
     mongo_transaction
 )
+from billing.settings_service_mongo import SettingsServiceMongo, UserManagementServiceMongo
 
 logger = logging.getLogger(__name__)
 
+# Wallet credits are int64 micro-credits (see billing.mongodb.MICROCREDITS_PER_CREDIT)
+_ZERO = Int64(0)
+
+# get_wallet_info's response shape, with micro-credits converted to float server-side
+_WALLET_INFO_PROJECTION = {
+    '_id': 0,
+    'credits_remaining': {'$divide': [{'$ifNull': ['$wallet.creditsRemaining', 0]}, MICROCREDITS_PER_CREDIT]},
+    'total_purchased': {'$divide': [{'$ifNull': ['$wallet.totalCreditsPurchased', 0]}, MICROCREDITS_PER_CREDIT]},
+    'updated_at': '$wallet.updatedAt',
+    'email': 1
+}
+
+# (days since epoch, UTC midnight) - rebuilt only when the day rolls over
+_today: Tuple[int, datetime] = (-1, datetime.min)
+
+
+def _today_start() -> datetime:
+    """Start of the current UTC day, cached until midnight"""
+    global _today
+    day = int(time.time() // 86400)
+    if _today[0] != day:
+        _today = (day, datetime(1970, 1, 1) + timedelta(days=day))
+    return _today[1]
+
+
+def _daily_used_expr(today_start: datetime) -> Dict:
+    """Aggregation expression for today's usage: wallet.dailyUsed, or 0 if last reset before today"""
+    return {'$cond': [
+        {'$lt': ['$wallet.dailyResetAt', today_start]},
+        _ZERO,
+        {'$ifNull': ['$wallet.dailyUsed', _ZERO]}
+    ]}
+
 
 class WalletServiceMongo:
     """MongoDB-based wallet service for credit management"""
@@ -41,23 +78,25 @@ class WalletServiceMongo:
             User document
         """
         collection = db.billing_users
+        oid = to_object_id(mongo_user_id)
         
         # Try to find existing user
-        user = collection.find_one({'mongoUserId': ObjectId(mongo_user_id)})
+        user = collection.find_one({'mongoUserId': oid})
         
         if user is None:
             # Create new user with embedded wallet
+            now = datetime.utcnow()
             new_user = {
-                'mongoUserId': ObjectId(mongo_user_id),
+                'mongoUserId': oid,
                 'email': email or f"{mongo_user_id}@placeholder.local",
                 'isSuspended': False,
                 'lowCreditNotified': False,
                 'wallet': {
-                    'creditsRemaining': Decimal128("0"),
-                    'totalCreditsPurchased': Decimal128("0"),
-                    'updatedAt': datetime.utcnow()
+                    'creditsRemaining': _ZERO,
+                    'totalCreditsPurchased': _ZERO,
+                    'updatedAt': now
                 },
-                'createdAt': datetime.utcnow()
+                'createdAt': now
             }
             
             result = collection.insert_one(new_user)
@@ -83,19 +122,19 @@ class WalletServiceMongo:
         collection = db.billing_users
         
         user = collection.find_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
+            {'mongoUserId': to_object_id(mongo_user_id)},
             {'wallet.creditsRemaining': 1}
         )
         
         if not user or 'wallet' not in user:
             return Decimal('0')
         
-        return decimal128_to_decimal(user['wallet']['creditsRemaining'])
+        return from_micro(user['wallet'].get('creditsRemaining'))
     
     @staticmethod
     def get_daily_usage(db: Database, mongo_user_id: str) -> Decimal:
         """
-        Get today's total credit usage
+        Get today's total credit usage (wallet.dailyUsed, maintained by deduct_credits)
         
         Args:
             db: MongoDB database
@@ -104,40 +143,23 @@ class WalletServiceMongo:
         Returns:
             Today's usage as Decimal
         """
-        # Get user's billing_users _id
         user = db.billing_users.find_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'_id': 1}
+            {'mongoUserId': to_object_id(mongo_user_id)},
+            {'wallet.dailyUsed': 1, 'wallet.dailyResetAt': 1}
         )
         
-        if not user:
-            return Decimal('0')
-        
-        # Get today's start
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Aggregate usage for today
-        pipeline = [
-            {
-                '$match': {
-                    'userId': user['_id'],
-                    'createdAt': {'$gte': today_start}
-                }
-            },
-            {
-                '$group': {
-                    '_id': None,
-                    'total': {'$sum': '$creditsUsed'}
-                }
-            }
-        ]
-        
-        result = list(db.usage_logs.aggregate(pipeline))
-        
-        if not result or not result[0].get('total'):
+        if not user or 'wallet' not in user:
             return Decimal('0')
         
-        return decimal128_to_decimal(result[0]['total'])
+        return from_micro(WalletServiceMongo._used_today(user['wallet']))
+    
+    @staticmethod
+    def _used_today(wallet: Dict) -> int:
+        """Today's usage in micro-credits from a wallet's dailyUsed counter (0 if last reset before today)"""
+        reset_at = wallet.get('dailyResetAt')
+        if reset_at is None or reset_at < _today_start():
+            return 0
+        return wallet.get('dailyUsed') or 0
     
     @staticmethod
     def has_sufficient_credits(db: Database, mongo_user_id: str, required: Decimal) -> Tuple[bool, str]:
@@ -153,25 +175,25 @@ class WalletServiceMongo:
             Tuple of (has_credits, reason_if_not)
         """
         user = db.billing_users.find_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'wallet': 1, '_id': 1}
+            {'mongoUserId': to_object_id(mongo_user_id)},
+            {'wallet.creditsRemaining': 1, 'wallet.dailyUsed': 1, 'wallet.dailyResetAt': 1}
         )
         
         if not user or 'wallet' not in user:
             return False, "No billing account found. Please add credits."
         
-        balance = decimal128_to_decimal(user['wallet']['creditsRemaining'])
+        balance = user['wallet'].get('creditsRemaining') or 0
+        required_micro = to_micro(required)
         
-        if balance < required:
-            return False, f"Insufficient credits. Balance: {float(balance):.4f}, Required: {float(required):.4f}"
+        if balance < required_micro:
+            return False, f"Insufficient credits. Balance: {micro_to_float(balance):.4f}, Required: {float(required):.4f}"
         
         # Check daily cap
-        from billing.settings_service_mongo import SettingsServiceMongo
-        daily_usage = WalletServiceMongo.get_daily_usage(db, mongo_user_id)
-        daily_cap = Decimal(str(SettingsServiceMongo.get_daily_credit_cap(db)))
+        daily_usage = WalletServiceMongo._used_today(user['wallet'])
+        daily_cap = to_micro(SettingsServiceMongo.get_daily_credit_cap(db))
         
-        if daily_usage + required > daily_cap:
-            remaining_today = daily_cap - daily_usage
+        if daily_usage + required_micro > daily_cap:
+            remaining_today = micro_to_float(daily_cap - daily_usage)
             return False, f"Daily limit reached. Remaining today: {remaining_today:.2f} credits"
         
         return True, "OK"
@@ -179,7 +201,8 @@ class WalletServiceMongo:
     @staticmethod
     def deduct_credits(db: Database, mongo_user_id: str, amount: Decimal) -> Tuple[bool, str]:
         """
-        Atomically deduct credits from user wallet
+        Atomically deduct credits from user wallet, enforcing the balance and
+        the daily cap (tracked in wallet.dailyUsed / wallet.dailyResetAt)
         
         Args:
             db: MongoDB database
@@ -192,30 +215,53 @@ class WalletServiceMongo:
         if amount <= 0:
             return True, "No deduction needed"
         
-        collection = db.billing_users
+        amt = Int64(to_micro(amount))
+        cap = Int64(to_micro(SettingsServiceMongo.get_daily_credit_cap(db)))
+        today_start = _today_start()
+        now = datetime.utcnow()
+        
+        daily_used = _daily_used_expr(today_start)
+        allowed = {'$and': [
+            {'$gte': ['$wallet.creditsRemaining', amt]},
+            {'$lte': [{'$add': ['$$used', amt]}, cap]}
+        ]}
+        
+        # Balance check, daily cap check and deduction in one atomic update.
+        # All expressions see the pre-update document, which is also what
+        # ReturnDocument.BEFORE hands back for deciding the outcome below.
+        before = db.billing_users.find_one_and_update(
+            {'mongoUserId': to_object_id(mongo_user_id), 'wallet': {'$exists': True}},
+            [{'$set': {
+                'wallet.creditsRemaining': {'$let': {'vars': {'used': daily_used}, 'in': {'$cond': [
+                    allowed, {'$subtract': ['$wallet.creditsRemaining', amt]}, '$wallet.creditsRemaining'
+                ]}}},
+                'wallet.dailyUsed': {'$let': {'vars': {'used': daily_used}, 'in': {'$cond': [
+                    allowed, {'$add': ['$$used', amt]}, '$$used'
+                ]}}},
+                'wallet.dailyResetAt': today_start,
+                'wallet.updatedAt': {'$let': {'vars': {'used': daily_used}, 'in': {'$cond': [
+                    allowed, now, '$wallet.updatedAt'
+                ]}}}
+            }}],
+            projection={'_id': 0, 'wallet.creditsRemaining': 1, 'wallet.dailyUsed': 1, 'wallet.dailyResetAt': 1},
+            return_document=ReturnDocument.BEFORE
+        )
         
-        # Check sufficient credits first
-        has_credits, reason = WalletServiceMongo.has_sufficient_credits(db, mongo_user_id, amount)
-        if not has_credits:
-            return False, reason
+        if not before:
+            return False, "No billing account found. Please add credits."
         
-        # Atomic decrement using $inc
-        result = collection.find_one_and_update(
-            {
-                'mongoUserId': ObjectId(mongo_user_id),
-                'wallet.creditsRemaining': {'$gte': decimal_to_decimal128(amount)}
-            },
-            {
-                '$inc': {'wallet.creditsRemaining': decimal_to_decimal128(-amount)},
-                '$set': {'wallet.updatedAt': datetime.utcnow()}
-            },
-            return_document=ReturnDocument.AFTER
-        )
+        wallet = before['wallet']
+        balance = wallet.get('creditsRemaining') or 0
+        used_today = WalletServiceMongo._used_today(wallet)
         
-        if not result:
-            return False, "Insufficient credits or concurrent deduction conflict"
+        if balance < amt:
+            return False, f"Insufficient credits. Balance: {micro_to_float(balance):.4f}, Required: {float(amount):.4f}"
         
-        new_balance = decimal128_to_decimal(result['wallet']['creditsRemaining'])
+        if used_today + amt > cap:
+            remaining_today = micro_to_float(cap - used_today)
+            return False, f"Daily limit reached. Remaining today: {remaining_today:.2f} credits"
+        
+        new_balance = from_micro(balance - amt)
         logger.info(f"Deducted {amount} credits from {mongo_user_id}. New balance: {new_balance}")
         
         return True, str(new_balance)
@@ -238,27 +284,35 @@ class WalletServiceMongo:
             return False, Decimal('0')
         
         collection = db.billing_users
+        amt = Int64(to_micro(amount))
+        now = datetime.utcnow()
         
-        # Ensure user exists
-        WalletServiceMongo.get_or_create_user(db, mongo_user_id)
-        
-        # Atomic increment
+        # Create-or-deposit in one atomic upsert; $inc initialises the wallet
+        # fields of a newly inserted user
         result = collection.find_one_and_update(
-            {'mongoUserId': ObjectId(mongo_user_id)},
+            {'mongoUserId': to_object_id(mongo_user_id)},
             {
+                '$setOnInsert': {
+                    'email': f"{mongo_user_id}@placeholder.local",
+                    'isSuspended': False,
+                    'lowCreditNotified': False,
+                    'createdAt': now
+                },
                 '$inc': {
-                    'wallet.creditsRemaining': decimal_to_decimal128(amount),
-                    'wallet.totalCreditsPurchased': decimal_to_decimal128(amount) if source == "payment" else Decimal128("0")
+                    'wallet.creditsRemaining': amt,
+                    'wallet.totalCreditsPurchased': amt if source == "payment" else _ZERO
                 },
-                '$set': {'wallet.updatedAt': datetime.utcnow()}
+                '$set': {'wallet.updatedAt': now}
             },
+            projection={'_id': 0, 'wallet.creditsRemaining': 1},
+            upsert=True,
             return_document=ReturnDocument.AFTER
         )
         
         if not result:
             return False, Decimal('0')
         
-        new_balance = decimal128_to_decimal(result['wallet']['creditsRemaining'])
+        new_balance = from_micro(result['wallet']['creditsRemaining'])
         logger.info(f"Added {amount} credits to {mongo_user_id} (source: {source}). New balance: {new_balance}")
         
         return True, new_balance
@@ -275,46 +329,25 @@ class WalletServiceMongo:
         Returns:
             Wallet info dict or None
         """
-        user = db.billing_users.find_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'wallet': 1, 'email': 1}
-        )
-        
-        if not user or 'wallet' not in user:
-            return None
+        result = list(db.billing_users.aggregate([
+            {'$match': {'mongoUserId': to_object_id(mongo_user_id), 'wallet': {'$exists': True}}},
+            {'$limit': 1},
+            {'$project': _WALLET_INFO_PROJECTION}
+        ]))
         
-        wallet = user['wallet']
-        
-        return {
-            'credits_remaining': decimal128_to_float(wallet['creditsRemaining']),
-            'total_purchased': decimal128_to_float(wallet.get('totalCreditsPurchased', 0)),
-            'updated_at': wallet.get('updatedAt'),
-            'email': user.get('email')
-        }
+        return result[0] if result else None
     
     @staticmethod
     def suspend_user(db: Database, mongo_user_id: str) -> bool:
         """Suspend a user account"""
-        result = db.billing_users.update_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'$set': {'isSuspended': True}}
-        )
-        return result.modified_count > 0
+        return UserManagementServiceMongo.suspend_user(db, mongo_user_id)
     
     @staticmethod
     def unsuspend_user(db: Database, mongo_user_id: str) -> bool:
         """Unsuspend a user account"""
-        result = db.billing_users.update_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'$set': {'isSuspended': False}}
-        )
-        return result.modified_count > 0
+        return UserManagementServiceMongo.unsuspend_user(db, mongo_user_id)
     
     @staticmethod
     def is_suspended(db: Database, mongo_user_id: str) -> bool:
-        """Check if user is suspended"""
-        user = db.billing_users.find_one(
-            {'mongoUserId': ObjectId(mongo_user_id)},
-            {'isSuspended': 1}
-        )
-        return user.get('isSuspended', False) if user else False
+        """Check if user is suspended (served from the shared suspension cache)"""
+        return UserManagementServiceMongo.is_user_suspended(db, mongo_user_id)
@@ -1,9 +1,76 @@
 """Text file (.txt) data source connector"""
 import os
-from typing import List, Dict, Any
+import codecs
+from typing import List, Dict, Any, Iterator, Optional
 from langchain_core.documents import Document
 from .base import BaseDataSource
 
+try:
+    import cchardet as chardet
+    CHARDET_AVAILABLE = True
+except ImportError:
+    try:
+        import chardet
+        CHARDET_AVAILABLE = True
+    except ImportError:
+        CHARDET_AVAILABLE = False
+
+# Bytes read from the start of a file to detect its encoding
+ENCODING_SNIFF_BYTES = 4096
+
+# Characters decoded per read while splitting a file into paragraphs
+READ_CHUNK_CHARS = 65536
+
+
+def _detect_encoding(file_path: str) -> str:
+    """
+    Detect a text file's encoding from its first ENCODING_SNIFF_BYTES bytes.
+    
+    UTF-8 (with or without BOM) is recognised directly; anything else is
+    left to chardet when installed, falling back to latin-1.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(ENCODING_SNIFF_BYTES)
+    
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    
+    try:
+        head.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the sniff window is still UTF-8
+        if e.reason == 'unexpected end of data':
+            return 'utf-8'
+    
+    if CHARDET_AVAILABLE:
+        encoding = chardet.detect(head).get('encoding')
+        if encoding:
+            return encoding
+    
+    return 'latin-1'
+
+
+def _fallback_encoding(file_path: str, failed: str) -> str:
+    """
+    Encoding to re-read a file with after `failed` hit undecodable bytes
+    past the sniff window: chardet over the whole file when installed,
+    else latin-1, which decodes any byte sequence.
+    """
+    if CHARDET_AVAILABLE:
+        detector = chardet.UniversalDetector()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                detector.feed(chunk)
+                if detector.done:
+                    break
+        detector.close()
+        encoding = detector.result.get('encoding')
+        if encoding and codecs.lookup(encoding).name != codecs.lookup(failed).name:
+            return encoding
+    
+    return 'latin-1'
+
 
 class TXTSource(BaseDataSource):
     """Extract documents from plain text (.txt) files"""
@@ -26,49 +93,77 @@ class TXTSource(BaseDataSource):
         Extract documents from text files.
         Each file becomes one or more documents based on content.
         """
-        documents = []
-        
+        self.documents = list(self.iter_documents())
+        return self.documents
+    
+    def iter_documents(self) -> Iterator[Document]:
+        """
+        Stream documents from text files, one per paragraph.
+        Files are read in chunks, so memory stays bounded by the
+        longest paragraph rather than the file size.
+        """
         for file_path in self.file_paths:
             if not os.path.exists(file_path):
                 continue
                 
             filename = os.path.basename(file_path)
             
-            # Try different encodings
-            encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
-            content = None
-            
-            for encoding in encodings:
+            # Sniff the encoding once and read the file in a single pass,
+            # unless a later byte doesn't decode: then re-read with a fallback
+            # encoding, resuming after the paragraphs already yielded
+            encoding = _detect_encoding(file_path)
+            resume = 0
+            while True:
                 try:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        content = f.read()
+                    for doc in self._iter_file(file_path, filename, encoding, resume):
+                        resume = doc.metadata["paragraph_index"] + 1
+                        yield doc
                     break
-                except (UnicodeDecodeError, UnicodeError):
-                    continue
-            
-            if not content or not content.strip():
-                continue
-            
-            # Split large files into chunks by paragraphs
-            paragraphs = content.split('\n\n')
+                except UnicodeDecodeError:
+                    encoding = _fallback_encoding(file_path, encoding)
+    
+    def _iter_file(self, file_path: str, filename: str, encoding: str, start: int) -> Iterator[Document]:
+        """Paragraph documents of one file from paragraph index `start` on (strict decoding)"""
+        # Paragraphs are what content.split('\n\n') would give, found chunk by
+        # chunk: `pending` never holds a separator, so each new chunk is only
+        # searched from the end of the previous one
+        with open(file_path, 'r', encoding=encoding) as f:
+            pending = ''
+            index = 0
+            for chunk in iter(lambda: f.read(READ_CHUNK_CHARS), ''):
+                buf = pending + chunk
+                pos = 0
+                sep = buf.find('\n\n', max(len(pending) - 1, 0))
+                while sep >= 0:
+                    if index >= start:
+                        doc = self._make_document(buf[pos:sep], filename, index)
+                        if doc is not None:
+                            yield doc
+                    index += 1
+                    pos = sep + 2
+                    sep = buf.find('\n\n', pos)
+                pending = buf[pos:]
             
-            for i, para in enumerate(paragraphs):
-                para = para.strip()
-                if not para or len(para) < 10:
-                    continue
-                    
-                doc = Document(
-                    page_content=para,
-                    metadata={
-                        "source": filename,
-                        "source_type": "txt",
-                        "paragraph_index": i
-                    }
-                )
-                documents.append(doc)
+            if index >= start:
+                doc = self._make_document(pending, filename, index)
+                if doc is not None:
+                    yield doc
+    
+    @staticmethod
+    def _make_document(text: str, filename: str, index: int) -> Optional[Document]:
+        """Build a paragraph Document, skipping fragments under 10 characters"""
+        para = text.strip()
+        if len(para) < 10:
+            return None
         
-        self.documents = documents
-        return documents
+        return Document(
+            page_content=para,
+            metadata={
+                "source": filename,
+                "source_type": "txt",
+                "paragraph_index": index
+            }
+        )
     
     def get_metadata(self) -> Dict[str, Any]:
         """Return metadata about the TXT source"""
@@ -25,6 +25,7 @@ SERVER_SELECTION_TIMEOUT_MS = 5000
 CONNECT_TIMEOUT_MS = 10000
 MAX_RETRIES = 3
 RETRY_DELAY_BASE = 1  # seconds
+HEARTBEAT_FREQUENCY_MS = 10000  # driver's background server monitoring
 
 # Global client instance
 _client = None
@@ -39,18 +40,14 @@ def get_database():
     - Connection pooling (50 max connections)
     - Exponential backoff retry (3 attempts)
     - Proper connection timeouts
+    - Liveness left to the driver's heartbeat; no ping per call
     """
     global _client, _db
     
     if _db is not None:
-        # Verify connection is still alive
-        try:
-            _client.admin.command('ping')
-            return _db
-        except Exception:
-            logger.warning("MongoDB connection lost, attempting to reconnect...")
-            _client = None
-            _db = None
+        # The driver monitors the servers in the background and reconnects
+        # on its own; operations fail fast via serverSelectionTimeoutMS
+        return _db
     
     last_error = None
     
@@ -62,6 +59,7 @@ def get_database():
                 minPoolSize=MIN_POOL_SIZE,
                 serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
                 connectTimeoutMS=CONNECT_TIMEOUT_MS,
+                heartbeatFrequencyMS=HEARTBEAT_FREQUENCY_MS,
                 retryWrites=True,
                 retryReads=True
             )
@@ -140,14 +138,10 @@ def close_connection():
 
 
 def check_connection_health():
-    """Check if MongoDB connection is healthy"""
-    try:
-        if _client is None:
-            return False
-        _client.admin.command('ping')
-        return True
-    except Exception:
+    """Check if MongoDB connection is healthy (as of the driver's last heartbeat)"""
+    if _client is None:
         return False
+    return _client.topology_description.has_readable_server()
 
 
 # Alias for convenience
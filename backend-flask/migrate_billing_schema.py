@@ -0,0 +1,95 @@
+"""
+Migration Script: PostgreSQL billing schema updates
+Run this once after upgrading, before starting the server. It adds the
+columns that create_all() won't add to existing tables and backfills them
+in small batches, so the app never scans or locks usage_logs at startup.
+The server refuses to start (MigrationRequired) until it has been run.
+
+Usage:
+    python migrate_billing_schema.py
+
+Requirements:
+    - PostgreSQL must be running
+    - Set DATABASE_URL environment variable
+"""
+
+from sqlalchemy import text
+
+from billing.database import get_engine
+from billing.models import Base
+from billing.token_service import CREDIT_SCALE
+
+# Rows updated per backfill transaction (keeps row locks short)
+BACKFILL_BATCH_SIZE = 10000
+
+
+def _backfill(engine, table: str, assignment: str, pending: str, params: dict = None) -> int:
+    """Run 'UPDATE table SET assignment' over rows matching pending, one batch per transaction"""
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            updated = conn.execute(text(f"""
+                UPDATE {table} SET {assignment}
+                WHERE ctid IN (SELECT ctid FROM {table} WHERE {pending} LIMIT :batch)
+            """), {**(params or {}), "batch": BACKFILL_BATCH_SIZE}).rowcount
+        total += updated
+        if updated < BACKFILL_BATCH_SIZE:
+            return total
+
+
+def _create_index(engine, statement: str):
+    """CREATE INDEX CONCURRENTLY must run outside a transaction; it doesn't block writes"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(statement))
+
+
+def migrate():
+    print("=" * 50)
+    print("🔄 Billing schema migration (PostgreSQL)")
+    print("=" * 50)
+    
+    engine = get_engine()
+    
+    # Tables added since the last start (daily_usage_totals) don't exist yet
+    # on a first upgrade; create_all() leaves existing tables alone
+    Base.metadata.create_all(bind=engine)
+    
+    # Day bucket for usage_logs so daily breakdowns use an index range scan
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE usage_logs ADD COLUMN IF NOT EXISTS created_date DATE"))
+    updated = _backfill(engine, 'usage_logs', 'created_date = created_at::date',
+                        'created_date IS NULL AND created_at IS NOT NULL')
+    print(f"   ✅ usage_logs.created_date: {updated} row(s) backfilled")
+    _create_index(engine, "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_usage_user_day ON usage_logs (user_id, created_date)")
+    print("   ✅ idx_usage_user_day")
+    
+    # Integer credit units (x CREDIT_SCALE) so summaries aggregate with BIGINT math
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE usage_logs ADD COLUMN IF NOT EXISTS credits_used_int BIGINT"))
+        conn.execute(text("ALTER TABLE daily_usage_totals ADD COLUMN IF NOT EXISTS credits_int BIGINT"))
+    updated = _backfill(engine, 'usage_logs', 'credits_used_int = ROUND(credits_used * :scale)',
+                        'credits_used_int IS NULL', {"scale": CREDIT_SCALE})
+    print(f"   ✅ usage_logs.credits_used_int: {updated} row(s) backfilled")
+    updated = _backfill(engine, 'daily_usage_totals', 'credits_int = ROUND(credits * :scale)',
+                        'credits_int IS NULL', {"scale": CREDIT_SCALE})
+    print(f"   ✅ daily_usage_totals.credits_int: {updated} row(s) backfilled")
+    
+    # Backfill the daily rollup once, when it is first created. The table
+    # lock keeps concurrent runs (or a running app) from interleaving rows.
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE daily_usage_totals IN EXCLUSIVE MODE"))
+        inserted = conn.execute(text("""
+            INSERT INTO daily_usage_totals (user_id, date, queries, tokens, credits, credits_int)
+            SELECT user_id, created_date, COUNT(*), COALESCE(SUM(total_tokens), 0),
+                   COALESCE(SUM(credits_used), 0), COALESCE(SUM(credits_used_int), 0)
+            FROM usage_logs
+            WHERE NOT EXISTS (SELECT 1 FROM daily_usage_totals) AND created_date IS NOT NULL
+            GROUP BY user_id, created_date
+        """)).rowcount
+    print(f"   ✅ daily_usage_totals: {inserted} rollup row(s) backfilled")
+    
+    print("\n✨ Migration complete!")
+
+
+if __name__ == '__main__':
+    migrate()
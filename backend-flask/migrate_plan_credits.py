@@ -0,0 +1,45 @@
+"""
+Migration Script: Plan credits Decimal128 -> integer units
+Run this once to convert existing subscription_plans documents so that
+credits/bonusCredits are stored as integers (credits x 10000).
+
+Usage:
+    python migrate_plan_credits.py
+
+Requirements:
+    - MongoDB must be running
+    - Set MONGO_URL / MONGO_DB_NAME environment variables (optional)
+"""
+
+from decimal import Decimal
+
+from billing.mongodb import init_mongodb
+from billing.settings_service_mongo import plan_credits_to_units
+
+
+def migrate():
+    print("=" * 50)
+    print("🔄 Plan credits migration: Decimal128 → integer units")
+    print("=" * 50)
+    
+    db = init_mongodb(check_migrations=False)
+    migrated = 0
+    
+    for plan in db.subscription_plans.find({}, {'credits': 1, 'bonusCredits': 1}):
+        update = {}
+        for field in ('credits', 'bonusCredits'):
+            value = plan.get(field)
+            # Decimal128 values are decoded to Decimal by the billing codec
+            if isinstance(value, Decimal):
+                update[field] = plan_credits_to_units(value)
+        
+        if update:
+            db.subscription_plans.update_one({'_id': plan['_id']}, {'$set': update})
+            print(f"   ✅ Migrated: {plan['_id']}")
+            migrated += 1
+    
+    print(f"\n✨ Migration complete! {migrated} plan(s) updated")
+
+
+if __name__ == '__main__':
+    migrate()
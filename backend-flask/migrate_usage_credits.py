@@ -0,0 +1,41 @@
+"""
+Migration Script: usage_logs creditsUsed Decimal128 -> creditsUsedMicro int64
+Run this once so that existing usage logs carry creditsUsedMicro
+(credits x 1,000,000) like newly logged usage. The billing services only
+read creditsUsedMicro, so the API server refuses to start while any log
+still carries creditsUsed.
+
+Usage:
+    python migrate_usage_credits.py
+
+Requirements:
+    - MongoDB must be running (4.2+ for pipeline updates)
+    - Set MONGO_URL / MONGO_DB_NAME environment variables (optional)
+"""
+
+from billing.mongodb import init_mongodb, MICROCREDITS_PER_CREDIT
+
+
+def migrate():
+    print("=" * 50)
+    print("🔄 Usage credits migration: Decimal128 → micro-credits")
+    print("=" * 50)
+    
+    db = init_mongodb(check_migrations=False)
+    
+    # Converted server-side in a single pass; no documents are read into Python
+    result = db.usage_logs.update_many(
+        {'creditsUsedMicro': {'$exists': False}},
+        [
+            {'$set': {'creditsUsedMicro': {'$toLong': {'$round': [
+                {'$multiply': [{'$ifNull': ['$creditsUsed', 0]}, MICROCREDITS_PER_CREDIT]}, 0
+            ]}}}},
+            {'$unset': 'creditsUsed'}
+        ]
+    )
+    
+    print(f"\n✨ Migration complete! {result.modified_count} usage log(s) updated")
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,75 @@
+"""
+Migration Script: backfill usage_daily / agent_daily from usage_logs
+Run this once after upgrading, with the API server stopped, after
+migrate_usage_credits.py. Usage reports read the daily rollups, which
+only get new usage added to them, so existing usage_logs have to be
+rolled up once. The server refuses to start (MigrationRequired) while
+usage_logs has rows and either rollup is empty.
+
+Each rollup is rebuilt from usage_logs only if it is empty, so re-running
+after a failure finishes the one that is missing. Run it while no server
+is writing usage: a running flusher's $inc on the same day would be
+overwritten by the rebuilt totals.
+
+Usage:
+    python migrate_usage_rollups.py
+
+Requirements:
+    - MongoDB must be running (4.2+ for $merge)
+    - Set MONGO_URL / MONGO_DB_NAME environment variables (optional)
+"""
+
+import sys
+
+from billing.mongodb import init_mongodb
+
+
+def _backfill(db, group_field: str, target: str):
+    """Group usage_logs per (group_field, day) and merge the totals into target"""
+    db.usage_logs.aggregate([
+        {'$group': {
+            '_id': {'key': f'${group_field}', 'date': {'$dateFromParts': {
+                'year': {'$year': '$createdAt'},
+                'month': {'$month': '$createdAt'},
+                'day': {'$dayOfMonth': '$createdAt'}
+            }}},
+            'queries': {'$sum': 1},
+            'tokens': {'$sum': '$totalTokens'},
+            'creditsMicro': {'$sum': '$creditsUsedMicro'}
+        }},
+        {'$project': {
+            '_id': 0,
+            group_field: '$_id.key',
+            'date': '$_id.date',
+            'queries': 1,
+            'tokens': 1,
+            'creditsMicro': 1
+        }},
+        {'$merge': {'into': target, 'on': [group_field, 'date'], 'whenMatched': 'replace'}}
+    ])
+
+
+def migrate():
+    print("=" * 50)
+    print("🔄 Usage rollup backfill: usage_logs → usage_daily / agent_daily")
+    print("=" * 50)
+
+    db = init_mongodb(check_migrations=False)
+
+    # The rollups sum creditsUsedMicro only
+    if db.usage_logs.find_one({'creditsUsed': {'$exists': True}}, {'_id': 1}) is not None:
+        print("❌ Usage logs still store Decimal128 credits - run migrate_usage_credits.py first")
+        sys.exit(1)
+
+    for group_field, target in (('userId', 'usage_daily'), ('agentName', 'agent_daily')):
+        if db[target].find_one({}, {'_id': 1}) is not None:
+            print(f"   ⏭️  {target} already populated, skipping")
+            continue
+        _backfill(db, group_field, target)
+        print(f"   ✅ {target}: {db[target].estimated_document_count()} rollup document(s)")
+
+    print("\n✨ Migration complete!")
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,50 @@
+"""
+Migration Script: billing_users wallet Decimal128 -> int64 micro-credits
+Run this once so that existing wallets store creditsRemaining,
+totalCreditsPurchased and dailyUsed as int64 micro-credits
+(credits x 1,000,000) like newly created wallets. The wallet service
+does integer arithmetic on these fields, so unmigrated wallets would
+be read at 1/1,000,000 of their real balance.
+
+Usage:
+    python migrate_wallet_credits.py
+
+Requirements:
+    - MongoDB must be running (4.2+ for pipeline updates)
+    - Set MONGO_URL / MONGO_DB_NAME environment variables (optional)
+"""
+
+from billing.mongodb import init_mongodb, MICROCREDITS_PER_CREDIT
+
+
+def _to_micro(field: str) -> dict:
+    """Pipeline expression converting a Decimal128 credits field to int64 micro-credits"""
+    return {'$toLong': {'$round': [
+        {'$multiply': [{'$ifNull': [field, 0]}, MICROCREDITS_PER_CREDIT]}, 0
+    ]}}
+
+
+def migrate():
+    print("=" * 50)
+    print("🔄 Wallet credits migration: Decimal128 → micro-credits")
+    print("=" * 50)
+
+    db = init_mongodb(check_migrations=False)
+
+    # Converted server-side in a single pass; no documents are read into Python
+    result = db.billing_users.update_many(
+        {'wallet.creditsRemaining': {'$type': 'decimal'}},
+        [
+            {'$set': {
+                'wallet.creditsRemaining': _to_micro('$wallet.creditsRemaining'),
+                'wallet.totalCreditsPurchased': _to_micro('$wallet.totalCreditsPurchased'),
+                'wallet.dailyUsed': _to_micro('$wallet.dailyUsed')
+            }}
+        ]
+    )
+
+    print(f"\n✨ Migration complete! {result.modified_count} wallet(s) updated")
+
+
+if __name__ == '__main__':
+    migrate()
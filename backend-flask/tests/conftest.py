@@ -0,0 +1,12 @@
+"""
+Shared test setup. Tests import the backend modules as `billing.*`, so the
+backend-flask directory is put on sys.path.
+
+Tests that need a live database are skipped unless it is configured:
+    BILLING_TEST_DATABASE_URL - PostgreSQL URL for the wallet deduct tests
+    BILLING_TEST_MONGO_URL    - MongoDB URL for the Mongo wallet deduct tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
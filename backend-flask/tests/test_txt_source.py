@@ -0,0 +1,45 @@
+"""
+TXTSource paragraph splitting: streamed in chunks, but paragraphs and their
+paragraph_index must match content.split('\\n\\n') on the whole file.
+"""
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from data_sources import txt_source
+from data_sources.txt_source import TXTSource
+
+
+def _paragraphs(path):
+    return [(d.metadata["paragraph_index"], d.page_content) for d in TXTSource([str(path)]).iter_documents()]
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 3, 65536])
+def test_paragraphs_match_double_newline_split(tmp_path, monkeypatch, chunk_chars):
+    monkeypatch.setattr(txt_source, "READ_CHUNK_CHARS", chunk_chars)
+    path = tmp_path / "doc.txt"
+    # A whitespace-only line doesn't end a paragraph; each extra blank line
+    # after a separator starts an (empty, skipped) paragraph of its own
+    path.write_text(
+        "first paragraph\n   \nstill the first\n\n\n\nsecond paragraph\n\nshort\n\nthird paragraph\n",
+        encoding="utf-8"
+    )
+
+    assert _paragraphs(path) == [
+        (0, "first paragraph\n   \nstill the first"),
+        (2, "second paragraph"),
+        (4, "third paragraph"),
+    ]
+
+
+def test_rereads_with_fallback_encoding(tmp_path, monkeypatch):
+    # The undecodable byte lies past the sniff window, so reading starts as UTF-8
+    monkeypatch.setattr(txt_source, "ENCODING_SNIFF_BYTES", 8)
+    monkeypatch.setattr(txt_source, "READ_CHUNK_CHARS", 16)
+    path = tmp_path / "latin.txt"
+    path.write_bytes(b"plain ascii paragraph\n\ncaf\xe9 au lait paragraph\n")
+
+    assert _paragraphs(path) == [
+        (0, "plain ascii paragraph"),
+        (1, "café au lait paragraph"),
+    ]
@@ -0,0 +1,132 @@
+"""
+UsageService flusher failure paths: a batch that can't be written is kept
+for retry (and still counts against the daily cap), spilled to disk after
+FLUSH_MAX_ATTEMPTS, and replayed from the spill file on the next start.
+"""
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from billing import spill
+from billing import usage_service
+from billing.models import UsageLog, generate_uuid
+from billing.token_service import CREDIT_SCALE
+from billing.usage_service import UsageService, FLUSH_MAX_ATTEMPTS
+
+
+class FakeSession:
+    """Records what a flush writes"""
+
+    def __init__(self):
+        self.saved = []
+        self.statements = []
+
+    def bulk_save_objects(self, rows):
+        self.saved.extend(rows)
+
+    def execute(self, stmt):
+        self.statements.append(stmt)
+
+
+def _sessions(session=None, error=None):
+    """Stand-in for billing.database.get_db_session"""
+    @contextmanager
+    def get_db_session():
+        if error is not None:
+            raise error
+        yield session
+    return get_db_session
+
+
+def _row(user_id="user-1", credits="0.5") -> UsageLog:
+    now = datetime.utcnow()
+    return UsageLog(
+        id=generate_uuid(), user_id=user_id, chatbot_id="bot", input_tokens=10, output_tokens=20,
+        total_tokens=30, credits_used=Decimal(credits), credits_used_int=int(Decimal(credits) * CREDIT_SCALE),
+        session_id="session", query_text=None, created_at=now, created_date=now.date()
+    )
+
+
+@pytest.fixture(autouse=True)
+def flusher_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(UsageService, "_retry", [])
+    monkeypatch.setattr(UsageService, "_pending_credits", {})
+    monkeypatch.setattr(usage_service, "SPILL_PATH", str(tmp_path / "usage_logs.spill.jsonl"))
+
+
+def _queue_pending(rows):
+    for row in rows:
+        UsageService._pending_credits[row.user_id] = UsageService.pending_credits(row.user_id) + row.credits_used
+
+
+def test_failed_batch_is_kept_for_retry(monkeypatch):
+    rows = [_row(), _row()]
+    _queue_pending(rows)
+    monkeypatch.setattr(usage_service, "get_db_session", _sessions(error=ConnectionError("db down")))
+
+    assert UsageService._write_batch(rows) is False
+
+    [(_, attempts, retried)] = UsageService._retry
+    assert attempts == 1
+    assert retried == rows
+    assert UsageService.pending_credits("user-1") == Decimal("1.0")
+    assert not os.path.exists(usage_service.SPILL_PATH)
+
+
+def test_due_retry_writes_batch_and_releases_pending(monkeypatch):
+    rows = [_row()]
+    _queue_pending(rows)
+    session = FakeSession()
+    monkeypatch.setattr(usage_service, "get_db_session", _sessions(session))
+    UsageService._retry.append((0.0, 1, rows))
+
+    UsageService._retry_due()
+
+    assert session.saved == rows
+    assert len(session.statements) == 1  # one daily_usage_totals upsert
+    assert UsageService._retry == []
+    assert UsageService.pending_credits("user-1") == Decimal("0")
+
+
+def test_batch_is_spilled_after_max_attempts(monkeypatch):
+    rows = [_row(), _row(user_id="user-2", credits="1.25")]
+    _queue_pending(rows)
+    monkeypatch.setattr(usage_service, "get_db_session", _sessions(error=ConnectionError("db down")))
+
+    assert UsageService._write_batch(rows, FLUSH_MAX_ATTEMPTS - 1) is True
+
+    assert UsageService._retry == []
+    assert len(spill.read(usage_service.SPILL_PATH)) == 2
+    assert UsageService.pending_credits("user-1") == Decimal("0")
+    assert UsageService.pending_credits("user-2") == Decimal("0")
+
+
+def test_spilled_batch_is_replayed(monkeypatch):
+    rows = [_row(), _row(user_id="user-2", credits="1.25")]
+    monkeypatch.setattr(usage_service, "get_db_session", _sessions(error=ConnectionError("db down")))
+    UsageService._write_batch(rows, FLUSH_MAX_ATTEMPTS - 1)
+
+    session = FakeSession()
+    monkeypatch.setattr(usage_service, "get_db_session", _sessions(session))
+    UsageService._replay_spill()
+
+    assert [row.id for row in session.saved] == [row.id for row in rows]
+    assert [row.credits_used for row in session.saved] == [Decimal("0.5"), Decimal("1.25")]
+    assert [row.created_at for row in session.saved] == [row.created_at for row in rows]
+    assert not os.path.exists(usage_service.SPILL_PATH)
+
+
+def test_failed_replay_keeps_spill_file(monkeypatch, tmp_path):
+    rows = [_row()]
+    monkeypatch.setattr(usage_service, "get_db_session", _sessions(error=ConnectionError("db down")))
+    UsageService._write_batch(rows, FLUSH_MAX_ATTEMPTS - 1)
+
+    UsageService._replay_spill()
+
+    assert len(spill.read(usage_service.SPILL_PATH)) == 1
+    assert os.listdir(tmp_path) == [os.path.basename(usage_service.SPILL_PATH)]
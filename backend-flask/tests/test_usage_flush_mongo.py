@@ -0,0 +1,162 @@
+"""
+UsageServiceMongo flusher failure paths: writes are acknowledged, a failed
+batch resumes from the FLUSH_STEPS write that failed (so rollup increments
+are never applied twice), and batches that keep failing are spilled and
+replayed from their recorded step.
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("dotenv")
+
+from bson import ObjectId, json_util
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from billing import spill
+from billing import usage_service_mongo
+from billing.usage_service_mongo import (
+    UsageServiceMongo,
+    FLUSH_MAX_ATTEMPTS,
+    FLUSH_STEPS,
+    FLUSH_WRITE_CONCERN,
+)
+
+
+class FakeCollection:
+    """Records writes; the first `fail_times` writes raise"""
+
+    def __init__(self, name, fail_times=0, error=None):
+        self.name = name
+        self.fail_times = fail_times
+        self.error = error or AutoReconnect("connection lost")
+        self.calls = []
+
+    def _write(self, payload):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise self.error
+        self.calls.append(list(payload))
+
+    def insert_many(self, docs, ordered=True):
+        self._write(docs)
+
+    def bulk_write(self, ops, ordered=True):
+        self._write(ops)
+
+
+class FakeDb:
+    def __init__(self, **fail_times):
+        for name in FLUSH_STEPS:
+            setattr(self, name, FakeCollection(name, fail_times.get(name, 0)))
+        self.options = {}
+
+    def with_options(self, **options):
+        self.options = options
+        return self
+
+
+def _doc() -> dict:
+    return {
+        "_id": ObjectId(),
+        "userId": ObjectId(),
+        "agentName": "bot",
+        "totalTokens": 30,
+        "creditsUsedMicro": 500000,
+        "createdAt": datetime(2026, 10, 16, 12, 0),
+    }
+
+
+def _writes(db) -> dict:
+    return {name: len(getattr(db, name).calls) for name in FLUSH_STEPS}
+
+
+@pytest.fixture(autouse=True)
+def flusher_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(UsageServiceMongo, "_retry", [])
+    monkeypatch.setattr(usage_service_mongo, "SPILL_PATH", str(tmp_path / "mongo_usage_logs.spill.jsonl"))
+
+
+def _use(monkeypatch, db):
+    monkeypatch.setattr(usage_service_mongo, "get_mongo_db", lambda: db)
+    return db
+
+
+def test_batch_is_written_with_acknowledged_write_concern(monkeypatch):
+    db = _use(monkeypatch, FakeDb())
+
+    assert UsageServiceMongo._write_batch([_doc(), _doc()]) is True
+
+    assert db.options["write_concern"] == FLUSH_WRITE_CONCERN
+    assert FLUSH_WRITE_CONCERN.acknowledged
+    assert _writes(db) == {"usage_logs": 1, "usage_daily": 1, "agent_daily": 1}
+
+
+def test_failed_batch_resumes_from_failed_step(monkeypatch):
+    db = _use(monkeypatch, FakeDb(usage_daily=1))
+    docs = [_doc()]
+
+    assert UsageServiceMongo._write_batch(docs) is False
+
+    [(_, attempts, retried, step)] = UsageServiceMongo._retry
+    assert (attempts, retried, step) == (1, docs, FLUSH_STEPS.index("usage_daily"))
+
+    UsageServiceMongo._retry[0] = (0.0, attempts, retried, step)
+    UsageServiceMongo._retry_due()
+
+    assert UsageServiceMongo._retry == []
+    # Logs inserted once, each rollup incremented once
+    assert _writes(db) == {"usage_logs": 1, "usage_daily": 1, "agent_daily": 1}
+
+
+def test_duplicate_logs_from_earlier_attempt_are_ignored():
+    duplicate = BulkWriteError({"writeErrors": [{"code": 11000, "index": 0}], "writeConcernErrors": []})
+    db = FakeDb()
+    db.usage_logs = FakeCollection("usage_logs", fail_times=1, error=duplicate)
+
+    UsageServiceMongo._insert_logs(db, [_doc()])
+
+
+def test_other_insert_errors_are_raised():
+    failure = BulkWriteError({"writeErrors": [{"code": 121, "index": 0}], "writeConcernErrors": []})
+    db = FakeDb()
+    db.usage_logs = FakeCollection("usage_logs", fail_times=1, error=failure)
+
+    with pytest.raises(BulkWriteError):
+        UsageServiceMongo._insert_logs(db, [_doc()])
+
+
+def test_batch_is_spilled_with_completed_step(monkeypatch):
+    _use(monkeypatch, FakeDb(agent_daily=1))
+    docs = [_doc(), _doc()]
+
+    assert UsageServiceMongo._write_batch(docs, FLUSH_MAX_ATTEMPTS - 1) is True
+
+    assert UsageServiceMongo._retry == []
+    records = [json_util.loads(line) for line in spill.read(usage_service_mongo.SPILL_PATH)]
+    assert [record["doc"]["_id"] for record in records] == [doc["_id"] for doc in docs]
+    assert {record["step"] for record in records} == {FLUSH_STEPS.index("agent_daily")}
+
+
+def test_spilled_batch_replays_only_remaining_steps(monkeypatch):
+    _use(monkeypatch, FakeDb(agent_daily=1))
+    UsageServiceMongo._write_batch([_doc()], FLUSH_MAX_ATTEMPTS - 1)
+
+    db = _use(monkeypatch, FakeDb())
+    UsageServiceMongo._replay_spill()
+
+    assert _writes(db) == {"usage_logs": 0, "usage_daily": 0, "agent_daily": 1}
+    assert not os.path.exists(usage_service_mongo.SPILL_PATH)
+
+
+def test_failed_replay_keeps_spill_file(monkeypatch):
+    _use(monkeypatch, FakeDb(usage_logs=1))
+    UsageServiceMongo._write_batch([_doc()], FLUSH_MAX_ATTEMPTS - 1)
+
+    _use(monkeypatch, FakeDb(usage_logs=1))
+    UsageServiceMongo._replay_spill()
+
+    records = [json_util.loads(line) for line in spill.read(usage_service_mongo.SPILL_PATH)]
+    assert [record["step"] for record in records] == [0]
@@ -0,0 +1,111 @@
+"""
+WalletService.deduct_credits against PostgreSQL: the balance and daily cap
+guards live in the UPDATE itself, so these need a real database.
+"""
+import os
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+from billing.models import Base, User, Wallet, DailyUsageTotal
+from billing.settings_service import SettingsService
+from billing.token_service import CREDIT_SCALE
+from billing.usage_service import UsageService
+from billing.wallet_service import WalletService
+
+DATABASE_URL = os.environ.get("BILLING_TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="BILLING_TEST_DATABASE_URL not set")
+
+DAILY_CAP = 20
+TEST_USER_PREFIX = "test-deduct-"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine(DATABASE_URL)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    monkeypatch.setattr(SettingsService, "get_daily_credit_cap", staticmethod(lambda db: DAILY_CAP))
+    yield session
+    session.rollback()
+    session.execute(delete(User).where(User.mongo_user_id.like(f"{TEST_USER_PREFIX}%")))
+    session.commit()
+    session.close()
+    engine.dispose()
+
+
+def _make_user(db, balance: str, used_today: str = "0") -> User:
+    mongo_user_id = f"{TEST_USER_PREFIX}{uuid.uuid4().hex[:12]}"
+    user = User(mongo_user_id=mongo_user_id, email=f"{mongo_user_id}@example.test")
+    db.add(user)
+    db.flush()
+    db.add(Wallet(user_id=user.id, credits_remaining=Decimal(balance)))
+    if Decimal(used_today):
+        db.add(DailyUsageTotal(
+            user_id=user.id, date=datetime.utcnow().date(), queries=1, tokens=0,
+            credits=Decimal(used_today), credits_int=int(Decimal(used_today) * CREDIT_SCALE)
+        ))
+    db.flush()
+    return user
+
+
+def _balance(db, user: User) -> Decimal:
+    return db.query(Wallet.credits_remaining).filter(Wallet.user_id == user.id).scalar()
+
+
+def test_deducts_from_funded_wallet(db):
+    user = _make_user(db, "10")
+
+    ok, message = WalletService.deduct_credits(db, user.mongo_user_id, Decimal("2.5"))
+
+    assert ok, message
+    assert _balance(db, user) == Decimal("7.5")
+
+
+def test_refuses_when_balance_is_short(db):
+    user = _make_user(db, "1")
+
+    ok, message = WalletService.deduct_credits(db, user.mongo_user_id, Decimal("2"))
+
+    assert not ok
+    assert message.startswith("Insufficient credits")
+    assert _balance(db, user) == Decimal("1")
+
+
+def test_refuses_past_daily_cap(db):
+    user = _make_user(db, "100", used_today=str(DAILY_CAP - 1))
+
+    ok, message = WalletService.deduct_credits(db, user.mongo_user_id, Decimal("2"))
+
+    assert not ok
+    assert message.startswith("Daily limit reached")
+    assert _balance(db, user) == Decimal("100")
+
+
+def test_queued_usage_counts_against_daily_cap(db, monkeypatch):
+    user = _make_user(db, "100", used_today="10")
+    monkeypatch.setitem(UsageService._pending_credits, user.id, Decimal("9"))
+
+    ok, message = WalletService.deduct_credits(db, user.mongo_user_id, Decimal("2"))
+
+    assert not ok
+    assert message.startswith("Daily limit reached")
+    assert _balance(db, user) == Decimal("100")
+
+
+def test_unknown_user_gets_empty_account(db):
+    mongo_user_id = f"{TEST_USER_PREFIX}{uuid.uuid4().hex[:12]}"
+
+    ok, message = WalletService.deduct_credits(db, mongo_user_id, Decimal("1"))
+
+    assert not ok
+    assert message.startswith("Insufficient credits")
+    assert db.query(User).filter(User.mongo_user_id == mongo_user_id).first() is not None
@@ -0,0 +1,109 @@
+"""
+WalletServiceMongo.deduct_credits against MongoDB: the balance and daily cap
+guards run inside one pipeline update, so these need a real server (4.2+).
+"""
+import os
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("dotenv")
+
+from bson import ObjectId
+from bson.int64 import Int64
+from pymongo import MongoClient
+
+from billing.mongodb import BILLING_CODEC_OPTIONS, to_micro
+from billing.settings_service_mongo import SettingsServiceMongo
+from billing.wallet_service_mongo import WalletServiceMongo, _today_start
+
+MONGO_URL = os.environ.get("BILLING_TEST_MONGO_URL")
+
+pytestmark = pytest.mark.skipif(not MONGO_URL, reason="BILLING_TEST_MONGO_URL not set")
+
+DAILY_CAP = 20
+
+
+@pytest.fixture
+def db(monkeypatch):
+    client = MongoClient(MONGO_URL)
+    database = client.get_database(f"billing_test_{uuid.uuid4().hex[:8]}", codec_options=BILLING_CODEC_OPTIONS)
+    monkeypatch.setattr(SettingsServiceMongo, "get_daily_credit_cap", staticmethod(lambda db: DAILY_CAP))
+    yield database
+    client.drop_database(database.name)
+    client.close()
+
+
+def _make_user(db, balance: str, used_today: str = "0", reset_at=None) -> str:
+    mongo_user_id = ObjectId()
+    db.billing_users.insert_one({
+        "mongoUserId": mongo_user_id,
+        "email": f"{mongo_user_id}@example.test",
+        "wallet": {
+            "creditsRemaining": Int64(to_micro(balance)),
+            "dailyUsed": Int64(to_micro(used_today)),
+            "dailyResetAt": reset_at or _today_start(),
+        },
+    })
+    return str(mongo_user_id)
+
+
+def _wallet(db, mongo_user_id: str) -> dict:
+    return db.billing_users.find_one({"mongoUserId": ObjectId(mongo_user_id)})["wallet"]
+
+
+def test_deducts_and_counts_daily_usage(db):
+    user_id = _make_user(db, "10")
+
+    ok, message = WalletServiceMongo.deduct_credits(db, user_id, Decimal("2.5"))
+
+    assert ok, message
+    wallet = _wallet(db, user_id)
+    assert wallet["creditsRemaining"] == to_micro("7.5")
+    assert wallet["dailyUsed"] == to_micro("2.5")
+    assert wallet["dailyResetAt"] == _today_start()
+
+
+def test_refuses_when_balance_is_short(db):
+    user_id = _make_user(db, "1")
+
+    ok, message = WalletServiceMongo.deduct_credits(db, user_id, Decimal("2"))
+
+    assert not ok
+    assert message.startswith("Insufficient credits")
+    wallet = _wallet(db, user_id)
+    assert wallet["creditsRemaining"] == to_micro("1")
+    assert wallet["dailyUsed"] == 0
+
+
+def test_refuses_past_daily_cap(db):
+    user_id = _make_user(db, "100", used_today=str(DAILY_CAP - 1))
+
+    ok, message = WalletServiceMongo.deduct_credits(db, user_id, Decimal("2"))
+
+    assert not ok
+    assert message.startswith("Daily limit reached")
+    wallet = _wallet(db, user_id)
+    assert wallet["creditsRemaining"] == to_micro("100")
+    assert wallet["dailyUsed"] == to_micro(DAILY_CAP - 1)
+
+
+def test_usage_from_earlier_day_is_reset(db):
+    user_id = _make_user(db, "100", used_today=str(DAILY_CAP), reset_at=_today_start() - timedelta(days=1))
+
+    ok, message = WalletServiceMongo.deduct_credits(db, user_id, Decimal("1"))
+
+    assert ok, message
+    wallet = _wallet(db, user_id)
+    assert wallet["creditsRemaining"] == to_micro("99")
+    assert wallet["dailyUsed"] == to_micro("1")
+
+
+def test_no_billing_account(db):
+    ok, message = WalletServiceMongo.deduct_credits(db, str(ObjectId()), Decimal("1"))
+
+    assert not ok
+    assert message.startswith("No billing account")
@@ -9,6 +9,47 @@ from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# Dangerous patterns (injection attempts) in SQL connection strings
+SQL_DANGEROUS_PATTERNS = [
+    r';\s*(DROP|DELETE|TRUNCATE|ALTER|CREATE|INSERT|UPDATE)',
+    r'--',
+    r'/\*.*\*/',
+    r"'\s*OR\s*'",
+    r'UNION\s+SELECT',
+    r';\s*EXEC',
+    r'\$\{',
+    r'`.*`',
+]
+
+# Dangerous patterns in MongoDB connection strings
+MONGODB_DANGEROUS_PATTERNS = [
+    r'\$where',
+    r'\$function',
+    r'\$accumulator',
+    r'javascript:',
+    r'\{\s*\$',
+    r';\s*(db\.|use\s)',
+    r'\$\{',
+]
+
+
+def _compile_any(patterns):
+    """Compile patterns into one case-insensitive alternation; group p<i> names the i-th pattern"""
+    return re.compile(
+        '|'.join(f'(?P<p{i}>{pattern})' for i, pattern in enumerate(patterns)),
+        re.IGNORECASE
+    )
+
+
+_SQL_DANGER_RE = _compile_any(SQL_DANGEROUS_PATTERNS)
+_MONGODB_DANGER_RE = _compile_any(MONGODB_DANGEROUS_PATTERNS)
+_DB_NAME_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9_-]*$')
+_TABLE_NAME_RE = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
+_TABLE_NAME_BAD_CHARS_RE = re.compile(r'[;\'"\\`\-\*]')
+
+# str.translate table deleting control characters (keeps \t, \n and \r)
+_CONTROL_CHARS_TABLE = dict.fromkeys([*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), 0x7f])
+
 
 class ValidationError(Exception):
     """Custom exception for validation errors"""
@@ -32,22 +73,12 @@ def validate_sql_connection_string(connection_string: str) -> Tuple[bool, Option
     
     connection_string = connection_string.strip()
     
-    # Check for dangerous patterns (SQL injection attempts)
-    dangerous_patterns = [
-        r';\s*(DROP|DELETE|TRUNCATE|ALTER|CREATE|INSERT|UPDATE)',
-        r'--',
-        r'/\*.*\*/',
-        r"'\s*OR\s*'",
-        r'UNION\s+SELECT',
-        r';\s*EXEC',
-        r'\$\{',
-        r'`.*`',
-    ]
-    
-    for pattern in dangerous_patterns:
-        if re.search(pattern, connection_string, re.IGNORECASE):
-            logger.warning(f"Dangerous pattern detected in SQL connection string: {pattern}")
-            return False, "Invalid characters or patterns in connection string"
+    # Check for dangerous patterns (SQL injection attempts), all in one pass
+    match = _SQL_DANGER_RE.search(connection_string)
+    if match:
+        pattern = SQL_DANGEROUS_PATTERNS[int(match.lastgroup[1:])]
+        logger.warning(f"Dangerous pattern detected in SQL connection string: {pattern}")
+        return False, "Invalid characters or patterns in connection string"
     
     # Validate URL format
     valid_schemes = ['postgresql', 'postgres', 'mysql', 'sqlite', 'mssql', 'oracle']
@@ -94,21 +125,12 @@ def validate_mongodb_connection_string(connection_string: str) -> Tuple[bool, Op
     
     connection_string = connection_string.strip()
     
-    # Check for dangerous patterns
-    dangerous_patterns = [
-        r'\$where',
-        r'\$function',
-        r'\$accumulator',
-        r'javascript:',
-        r'\{\s*\$',
-        r';\s*(db\.|use\s)',
-        r'\$\{',
-    ]
-    
-    for pattern in dangerous_patterns:
-        if re.search(pattern, connection_string, re.IGNORECASE):
-            logger.warning(f"Dangerous pattern detected in MongoDB connection string: {pattern}")
-            return False, "Invalid characters or patterns in connection string"
+    # Check for dangerous patterns, all in one pass
+    match = _MONGODB_DANGER_RE.search(connection_string)
+    if match:
+        pattern = MONGODB_DANGEROUS_PATTERNS[int(match.lastgroup[1:])]
+        logger.warning(f"Dangerous pattern detected in MongoDB connection string: {pattern}")
+        return False, "Invalid characters or patterns in connection string"
     
     # Validate URL format
     valid_schemes = ['mongodb', 'mongodb+srv']
@@ -154,7 +176,7 @@ def validate_database_name(db_name: str) -> Tuple[bool, Optional[str]]:
         return False, "Database name cannot be empty"
     
     # Check for valid characters (alphanumeric, underscore, hyphen)
-    if not re.match(r'^[a-zA-Z][a-zA-Z0-9_-]*$', db_name):
+    if not _DB_NAME_RE.match(db_name):
         return False, "Database name must start with a letter and contain only letters, numbers, underscores, and hyphens"
     
     # Check for reserved words
@@ -187,11 +209,11 @@ def validate_table_names(tables_str: str) -> Tuple[bool, Optional[str], Optional
     # Validate each table name
     for table in tables:
         # Check for SQL injection patterns
-        if re.search(r'[;\'"\\`\-\*]', table):
+        if _TABLE_NAME_BAD_CHARS_RE.search(table):
             return False, f"Invalid characters in table name: {table}", None
         
         # Check valid table name format
-        if not re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*$', table):
+        if not _TABLE_NAME_RE.match(table):
             return False, f"Invalid table name format: {table}", None
         
         # Check length
@@ -215,16 +237,9 @@ def sanitize_string(value: str, max_length: int = 1000) -> str:
     if not value or not isinstance(value, str):
         return ""
     
-    # Truncate to max length
-    value = value[:max_length]
-    
-    # Remove null bytes
-    value = value.replace('\x00', '')
-    
-    # Remove control characters except newlines and tabs
-    value = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', value)
-    
-    return value.strip()
+    # Truncate to max length, then remove null bytes and other control
+    # characters except newlines and tabs
+    return value[:max_length].translate(_CONTROL_CHARS_TABLE).strip()
 
 
 def validate_sample_limit(limit: any) -> Tuple[bool, Optional[str], int]: